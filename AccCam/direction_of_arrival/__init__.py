@@ -1,3 +1,11 @@
+from .cache import *
+from .covariance import *
 from .estimate import *
+from .fourier import *
 from .geometry import *
+from .gridless import *
+from .peaks import *
+from .region import *
+from .search import *
 from .utility import *
+from .wideband import *
@@ -0,0 +1,196 @@
+from collections import OrderedDict, namedtuple
+from multiprocessing import shared_memory
+import numpy as np
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'max_bytes', 'current_bytes', 'entries'])
+
+
+class SteeringCache:
+    """
+    Stores steering matrices on disk as .npy files so they can be memory-mapped instead of recomputed. Files are named
+    after a key (see Structure.geometry_hash). When the folder grows past max_bytes, the least recently used matrices
+    are deleted.
+    """
+    def __init__(self, path: str, max_bytes: int = 2 * 1024 ** 3):
+        """
+        :param path: The folder to keep the cached matrices in. Created if it does not exist.
+        :param max_bytes: The maximum total size of the cache folder in bytes. Default is 2 GiB.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f'{key}.npy')
+
+    def load(self, key: str):
+        """
+        Memory-map a cached matrix
+        :param key: The key of the matrix
+        :return: A read-only memory-mapped matrix, or None if the key is not cached
+        """
+        file = self._file(key)
+        try:
+            matrix = np.load(file, mmap_mode='r')
+        except (FileNotFoundError, ValueError):
+            return None
+
+        # Mark as recently used
+        os.utime(file)
+        logger.info(f'Loaded steering matrix {key} from {self.path}')
+        return matrix
+
+    def save(self, key: str, matrix: np.ndarray):
+        """
+        Save a matrix to the cache, then evict the least recently used matrices if the cache is too large
+        :param key: The key of the matrix
+        :param matrix: The matrix to save. Must be a numpy array
+        :return: None
+        """
+        if matrix.nbytes > self.max_bytes:
+            logger.warning(f'Steering matrix {key} of {matrix.nbytes} bytes is larger than the cache and was not saved')
+            return
+
+        # Write to a temporary file first so other processes never load a partial matrix
+        file = self._file(key)
+        temporary = f'{file}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as output_file:
+            np.save(output_file, matrix)
+        os.replace(temporary, file)
+
+        self.evict(keep=file)
+
+    def evict(self, keep: str = None):
+        """
+        Delete the least recently used matrices until the cache fits in max_bytes
+        :param keep: A file which should never be deleted
+        :return: None
+        """
+        entries = []
+        for name in os.listdir(self.path):
+            if not name.endswith('.npy'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.path, name))
+            except FileNotFoundError:   # Evicted by another process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, os.path.join(self.path, name)))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, file in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if file == keep:
+                continue
+            try:
+                os.remove(file)
+            except FileNotFoundError:
+                pass
+            total -= size
+            logger.info(f'Evicted {file} from the steering cache')
+
+    def clear(self):
+        """
+        Delete every cached matrix
+        :return: None
+        """
+        for name in os.listdir(self.path):
+            if name.endswith('.npy'):
+                os.remove(os.path.join(self.path, name))
+
+
+class MemoryCache:
+    """
+    Keeps recently used matrices in memory, such as steering matrices of several wavenumbers. When the matrices grow
+    past max_bytes, the least recently used ones are dropped. Counts hits and misses like functools.lru_cache.
+    Pickles empty, so copies sent to other processes start their own cache.
+    """
+    def __init__(self, max_bytes: int):
+        """
+        :param max_bytes: The maximum total size of the kept matrices in bytes. Matrices larger than this are never kept
+        """
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute):
+        """
+        Look up a matrix, computing and keeping it on a miss
+        :param key: Any hashable key of the matrix
+        :param compute: A function without arguments which computes the matrix
+        :return: The matrix
+        """
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        self.misses += 1
+        matrix = compute()
+        if matrix.nbytes <= self.max_bytes:
+            # Drop the least recently used matrices until the new one fits
+            while self._current_bytes + matrix.nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._current_bytes -= evicted.nbytes
+            self._entries[key] = matrix
+            self._current_bytes += matrix.nbytes
+        return matrix
+
+    def cache_info(self) -> CacheInfo:
+        """
+        :return: The hits, misses, max_bytes, current size in bytes, and number of kept matrices
+        """
+        return CacheInfo(self.hits, self.misses, self.max_bytes, self._current_bytes, len(self._entries))
+
+    def clear(self):
+        """
+        Drop every kept matrix and reset the statistics
+        :return: None
+        """
+        self._entries.clear()
+        self._current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        return {'max_bytes': self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state['max_bytes'])
+
+
+def share_array(array: np.ndarray, name: str = None) -> tuple[shared_memory.SharedMemory, np.ndarray]:
+    """
+    Copy an array into a new block of named shared memory
+    :param array: The array to copy. Must be a numpy array
+    :param name: The name of the shared memory block. Default is a unique name generated by SharedMemory, which never
+        collides with a block of another structure, process or crashed run
+    :return: The shared memory block and a read-only array backed by it. Keep a reference to the block for as long as
+        the array is used.
+    """
+    block = shared_memory.SharedMemory(name=name, create=True, size=array.nbytes)
+    shared = np.ndarray(array.shape, array.dtype, buffer=block.buf, order='F' if np.isfortran(array) else 'C')
+    shared[...] = array
+    shared.flags.writeable = False
+    return block, shared
+
+
+def attach_array(name: str, shape: tuple, dtype: str, order: str) -> tuple[shared_memory.SharedMemory, np.ndarray]:
+    """
+    Attach to an array published by share_array, possibly from another process
+    :param name: The name of the shared memory block
+    :param shape: The shape of the array
+    :param dtype: The dtype of the array
+    :param order: The memory layout of the array, C or F
+    :return: The shared memory block and a read-only array backed by it
+    """
+    block = shared_memory.SharedMemory(name=name)
+    shared = np.ndarray(shape, dtype, buffer=block.buf, order=order)
+    shared.flags.writeable = False
+    return block, shared
@@ -0,0 +1,189 @@
+from AccCam.__config__ import __USE_CUPY__
+
+if __USE_CUPY__:
+    import cupy as np
+else:
+    import numpy as np
+
+from abc import ABC, abstractmethod
+from collections import deque
+
+
+def scatter_matrix(data: np.ndarray) -> tuple[np.ndarray, int]:
+    """
+    The sum of outer products of the mean-removed snapshots of a block. Dividing by (snapshots - 1) gives the same
+    covariance as np.cov(data.T), see calculate_covariance.
+    :param data: The signal matrix with one snapshot per row. Can also be a stack of (batch, samples, channels) signal
+        matrices
+    :return: The scatter matrix, or a stack of them, and the number of snapshots
+    """
+    centered = data - np.mean(data, axis=-2, keepdims=True)
+    return np.swapaxes(centered, -1, -2) @ centered.conj(), data.shape[-2]
+
+
+class CovarianceEstimator(ABC):
+    """
+    Estimates the covariance matrix from a stream of blocks. Keeps history between blocks, so short blocks (low latency)
+    can still give a stable covariance. Give one to BartlettBeamformer, MVDRBeamformer, or Music in place of the
+    per-block covariance.
+    """
+    @abstractmethod
+    def update(self, data: np.ndarray) -> np.ndarray:
+        """
+        Add a block to the estimate
+        :param data: The signal matrix of the new block
+        :return: The current covariance matrix
+        """
+        raise NotImplementedError
+
+    def reset(self):
+        """
+        Forget all history
+        :return: None
+        """
+        pass
+
+
+class RecursiveCovariance(CovarianceEstimator):
+    """
+    Exponentially weighted covariance: R = forgetting_factor * R + (1 - forgetting_factor) * R_block. The effective
+    memory is about 1 / (1 - forgetting_factor) blocks.
+    """
+    def __init__(self, forgetting_factor: float = 0.9):
+        """
+        :param forgetting_factor: The weight of the history, between 0 (no history) and 1 (never forget). Default is 0.9
+        """
+        if not 0 <= forgetting_factor < 1:
+            raise ValueError(f'forgetting_factor must be in [0, 1), got {forgetting_factor}')
+        self.forgetting_factor = forgetting_factor
+        self.covariance = None
+
+    def update(self, data: np.ndarray) -> np.ndarray:
+        scatter, num_snapshots = scatter_matrix(data)
+        block_covariance = scatter / (num_snapshots - 1)
+
+        if self.covariance is None:
+            self.covariance = block_covariance
+        else:
+            self.covariance = self.forgetting_factor * self.covariance + (1 - self.forgetting_factor) * block_covariance
+        return self.covariance
+
+    def reset(self):
+        self.covariance = None
+
+
+class SlidingCovariance(CovarianceEstimator):
+    """
+    Covariance over the snapshots of the last few blocks with equal weight. Older blocks drop out completely.
+    """
+    def __init__(self, num_blocks: int = 10):
+        """
+        :param num_blocks: The number of most recent blocks to estimate from. Default is 10.
+        """
+        self.num_blocks = num_blocks
+        self._blocks = deque(maxlen=num_blocks)
+        self._scatter = None
+        self._num_snapshots = 0
+
+    def update(self, data: np.ndarray) -> np.ndarray:
+        # Keep a running sum rather than summing the window every block
+        if len(self._blocks) == self.num_blocks:
+            old_scatter, old_snapshots = self._blocks[0]
+            self._scatter = self._scatter - old_scatter
+            self._num_snapshots -= old_snapshots
+
+        scatter, num_snapshots = scatter_matrix(data)
+        self._blocks.append((scatter, num_snapshots))
+        self._scatter = scatter if self._scatter is None else self._scatter + scatter
+        self._num_snapshots += num_snapshots
+
+        return self._scatter / (self._num_snapshots - 1)
+
+    def reset(self):
+        self._blocks.clear()
+        self._scatter = None
+        self._num_snapshots = 0
+
+
+class DecimatedCovariance(CovarianceEstimator):
+    """
+    Covariance from every factor-th snapshot only. After a narrow bandpass filter (see FirwinFilter) neighbouring
+    snapshots are strongly correlated and add little to the estimate, so this cuts the cost of the covariance by factor
+    without losing accuracy. Decimating aliases the band to another frequency, but does not change the phases between
+    elements, which is all the covariance holds. Keep factor below samplerate / bandwidth so enough independent
+    snapshots remain.
+    """
+    def __init__(self, factor: int, covariance: CovarianceEstimator = None):
+        """
+        :param factor: Keep one snapshot out of this many
+        :param covariance: If provided, pass the kept snapshots to this estimator (for example RecursiveCovariance) to
+            keep history between blocks. Default uses the kept snapshots of the current block only
+        """
+        if factor < 1:
+            raise ValueError(f'factor must be at least 1, got {factor}')
+        self.factor = factor
+        self.covariance = covariance
+        self._offset = 0
+        self._last = None
+
+    def update(self, data: np.ndarray) -> np.ndarray:
+        # Keep the same stride across blocks, as if the stream was decimated as a whole
+        snapshots = data[self._offset::self.factor]
+        self._offset = (self._offset - data.shape[0]) % self.factor
+
+        # A block shorter than the offset holds no kept snapshot, so the estimate stays as it was
+        if snapshots.shape[0] == 0:
+            if self._last is None:
+                raise ValueError(f'A block of {data.shape[0]} samples holds no snapshot to estimate from')
+            return self._last
+
+        if self.covariance is not None:
+            self._last = self.covariance.update(snapshots)
+        else:
+            scatter, num_snapshots = scatter_matrix(snapshots)
+            self._last = scatter / (num_snapshots - 1)
+        return self._last
+
+    def reset(self):
+        self._offset = 0
+        self._last = None
+        if self.covariance is not None:
+            self.covariance.reset()
+
+
+class BandCovariance(CovarianceEstimator):
+    """
+    Covariance from the FFT bins of a block around the target frequency, rather than from its time samples. Every bin
+    in the band is one complex snapshot, so the covariance costs one FFT of the block plus the outer products of a few
+    bins, replaces a bandpass filter, and holds the phases between elements even for real audio.
+    """
+    def __init__(self, frequency: float, bandwidth: float, samplerate: int, window: bool = True):
+        """
+        :param frequency: The center of the band in Hz, usually the frequency of the structure's wavenumber
+        :param bandwidth: The width of the band in Hz. Must hold at least one bin, that is samplerate / blocksize, and
+            should hold more bins than there are sources
+        :param samplerate: The samplerate of the data
+        :param window: If true, apply a Hanning window before the FFT so strong signals outside the band do not leak
+            into it. Default is True
+        """
+        self.frequency = frequency
+        self.bandwidth = bandwidth
+        self.samplerate = samplerate
+        self.window = window
+
+    def update(self, data: np.ndarray) -> np.ndarray:
+        num_samples = data.shape[0]
+        if self.window:
+            data = data * np.hanning(num_samples)[:, np.newaxis]
+
+        frequencies = np.fft.rfftfreq(num_samples, 1 / self.samplerate)
+        bins = np.flatnonzero(np.abs(frequencies - self.frequency) <= self.bandwidth / 2)
+        if len(bins) == 0:
+            raise ValueError(f'No FFT bin of a {num_samples} sample block lies within {self.bandwidth / 2} Hz of '
+                             f'{self.frequency} Hz')
+
+        if np.isrealobj(data):
+            snapshots = np.fft.rfft(data, axis=0)[bins]
+        else:
+            snapshots = np.fft.fft(data, axis=0)[bins]
+        return snapshots.T @ snapshots.conj() / len(bins)
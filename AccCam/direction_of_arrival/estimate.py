@@ -5,29 +5,34 @@ if __USE_CUPY__:
 else:
     import numpy as np
 
+from AccCam.direction_of_arrival.covariance import CovarianceEstimator, scatter_matrix
 from AccCam.direction_of_arrival.geometry import Structure
+from AccCam.direction_of_arrival.region import Region
 from abc import ABC, abstractmethod
 
 
 def calculate_covariance(data: np.ndarray) -> np.ndarray:
     """
-    :param data: The signal matrix to find the covariance of
-    :return: The covariance matrix of the signal matrix
+    :param data: The signal matrix to find the covariance of. Can also be a stack of (batch, samples, channels) signal
+        matrices
+    :return: The covariance matrix of the signal matrix, the same as np.cov(data.T), or a stack of them
     """
-    return np.cov(data.T)
+    scatter, num_snapshots = scatter_matrix(data)
+    return scatter / (num_snapshots - 1)
 
 
 def calculate_noise_subspace(cov_data: np.ndarray, num_sources: int) -> np.ndarray:
     """
     Find the noise subspace of a provided signal
-    :param cov_data: The covariance matrix to find the noise subspace of
+    :param cov_data: The covariance matrix to find the noise subspace of. Can also be a stack of covariance matrices
     :param num_sources: The number of sources in the environment
     :return:
     """
     # Decompose into eigenvalues and vectors
     eigvals, eigvecs = np.linalg.eigh(cov_data)
 
-    noise_subspace = eigvecs[:, np.argsort(eigvals)][:, :-num_sources]
+    order = np.argsort(eigvals, axis=-1)[..., np.newaxis, :]
+    noise_subspace = np.take_along_axis(eigvecs, order, axis=-1)[..., :-num_sources]
     return noise_subspace
 
 
@@ -51,95 +56,450 @@ class Estimator(ABC):
         raise NotImplementedError
 
 
-class DelaySumBeamformer(Estimator):
+class SpectralEstimator(Estimator):
     """
-    Implements a delay-and-sum (conventional) beamformer
+    Base class for estimators which scan a spectrum over steering vectors. The work is split into prepare, which runs
+    once per block, and evaluate, which scores any set of steering vectors. This lets an estimator scan the whole grid
+    of the structure, or only a few directions of interest (see HierarchicalSearch).
     """
-    def __init__(self, structure: Structure):
+    # True if prepare needs an eigendecomposition of the covariance matrix, so one can be shared (see EstimatorBank)
+    uses_decomposition = False
+
+    def __init__(self,
+                 structure: Structure,
+                 num_peaks: int = None,
+                 covariance: CovarianceEstimator = None,
+                 tile_size: int = 16384,
+                 region: Region = None):
         """
         :param structure: The steering matrix to utilize to find the sources
+        :param num_peaks: If provided, process returns the strongest num_peaks peaks as (inclination, azimuth, power)
+            rows, refined between grid points, rather than the whole spectrum
+        :param covariance: If provided, estimate the covariance with it (for example RecursiveCovariance) rather than
+            from the current block only
+        :param tile_size: Evaluate the grid this many steering vectors at a time into a preallocated spectrum, so
+            temporaries are the size of a tile rather than of the steering matrix and stay in cache. None evaluates the
+            whole grid at once, which can be faster on a GPU (or steering_chunk_size steering vectors at a time if
+            the structure has lazy_steering). Default is 16384.
+        :param region: If provided, scan only the directions of this region of the structure's grid. Spectra and peaks
+            are then laid out on the grid of the region
         """
         super().__init__(structure)
+        self.num_peaks = num_peaks
+        self.covariance = covariance
+        self.tile_size = tile_size
+        self.region = region
+        # The wavenumber to scan at. None scans at the structure's. Set it before a block to follow a source whose
+        # frequency changes, see Structure.steering_matrix_at
+        self.wavenumber = None
+
+    @property
+    def grid(self):
+        # The region if one is set, otherwise the structure. Both have the same grid properties
+        return self.region if self.region is not None else self.structure
+
+    def estimate_covariance(self, data: np.ndarray) -> np.ndarray:
+        """
+        :param data: The source data, or a (batch, samples, channels) stack of consecutive blocks
+        :return: The covariance matrix from the covariance estimator if one is set, otherwise from this block alone.
+            Converted to the precision of the structure.
+        """
+        if self.covariance is None:
+            cov_matrix = calculate_covariance(data)
+        elif data.ndim == 3:
+            # Blocks are treated as consecutive so the covariance estimator keeps its history
+            cov_matrix = np.stack([self.covariance.update(block) for block in data])
+        else:
+            cov_matrix = self.covariance.update(data)
+        return cov_matrix.astype(self.structure.complex_dtype, copy=False)
+
+    def prepare(self, data: np.ndarray):
+        """
+        Compute everything the spectrum needs from a block of data, such as the covariance matrix
+        :param data: The source data
+        :return: Anything evaluate accepts
+        """
+        return self.prepare_covariance(self.estimate_covariance(data))
+
+    def prepare_covariance(self, cov_matrix: np.ndarray):
+        """
+        Same as prepare, but from a covariance matrix. Must also accept a stack of covariance matrices
+        :param cov_matrix: The covariance matrix, or a (batch, channels, channels) stack of them
+        :return: Anything evaluate accepts
+        """
+        return cov_matrix
+
+    def prepare_decomposition(self, cov_matrix: np.ndarray, eigvals: np.ndarray, eigvecs: np.ndarray):
+        """
+        Same as prepare_covariance, but reuses an eigendecomposition of the covariance matrix which is already known,
+        for example one shared between several estimators (see EstimatorBank). Estimators which do not need it ignore it.
+        :param cov_matrix: The covariance matrix, or a stack of them
+        :param eigvals: The eigenvalues of cov_matrix from np.linalg.eigh, in ascending order
+        :param eigvecs: The eigenvectors of cov_matrix from np.linalg.eigh, one per column
+        :return: Anything evaluate accepts
+        """
+        return self.prepare_covariance(cov_matrix)
+
+    @abstractmethod
+    def evaluate(self, prepared, steering_matrix: np.ndarray) -> np.ndarray:
+        """
+        Compute the raw (not normalized) spectrum for a set of steering vectors. Must also accept prepared stacks from
+        prepare_covariance, returning one spectrum per row, and a matching stack of steering matrices, one per prepared
+        (see evaluate_bins).
+        :param prepared: The output of prepare
+        :param steering_matrix: A (num_elements, n) matrix of steering vectors, one per column, or a stack of them
+        :return: A vector of n powers
+        """
+        raise NotImplementedError
+
+    def compress(self, prepared, basis: np.ndarray):
+        """
+        Project prepared onto the basis of a low-rank factorization of the steering matrix (see
+        Structure.steering_factors), so evaluate can scan the coefficients in its place. Estimators which cannot be
+        evaluated in the reduced space return None and always scan the steering matrix.
+        :param prepared: The output of prepare or prepare_covariance
+        :param basis: The (num_elements, rank) orthonormal basis of the factorization
+        :return: The projected prepared, or None
+        """
+        return None
+
+    def evaluate_grid(self, prepared) -> np.ndarray:
+        """
+        Compute the raw spectrum over the whole grid of the structure (or region), tile_size steering vectors at a time.
+        Only reads the steering matrix through steering_tiles, so a structure with lazy_steering never builds it. If
+        the structure has steering_factors and the estimator supports compress, the coefficients are scanned instead.
+        :param prepared: The output of prepare or prepare_covariance
+        :return: The raw spectrum, or a stack of them for a prepared stack
+        """
+        num_columns = self.grid.num_columns
+        tiles = self.grid.steering_tiles(self.tile_size, self.wavenumber)
+        factors = self.grid.steering_factors if self.wavenumber in (None, self.structure.wavenumber) else None
+        compressed = self.compress(prepared, factors[0]) if factors is not None else None
+        if compressed is not None:
+            prepared, coefficients = compressed, factors[1]
+            tile_size = self.tile_size or num_columns
+            tiles = ((start, coefficients[:, start:start + tile_size]) for start in range(0, num_columns, tile_size))
+
+        spectra = None
+        for start, tile in tiles:
+            powers = self.evaluate(prepared, tile)
+            if tile.shape[1] == num_columns:
+                # A single tile, nothing to assemble
+                spectra = powers
+                break
+            if spectra is None:
+                spectra = np.empty(powers.shape[:-1] + (num_columns,), dtype=powers.dtype)
+            spectra[..., start:start + tile.shape[1]] = powers
+        return self.grid.expand_reduced(spectra)
+
+    def evaluate_bins(self, prepared, wavenumbers: np.ndarray, cache_steering: bool = True) -> np.ndarray:
+        """
+        Same as evaluate_grid for a prepared stack, where every prepared is scanned at its own wavenumber, for example
+        one per frequency bin (see WidebandEstimator).
+        :param prepared: The output of prepare_covariance for a stack of covariance matrices
+        :param wavenumbers: The wavenumber of every prepared of the stack
+        :param cache_steering: If true, steering matrices come from steering_tiles, and so from the caches of the
+            structure or region. If false, the steering vectors of every wavenumber are computed one tile at a time and
+            dropped, for when the matrices of every wavenumber do not fit in the cache. Default is True
+        :return: A (len(wavenumbers), grid) stack of raw spectra
+        """
+        num_columns = self.grid.num_columns
+        if cache_steering:
+            tiles = ((bin_tiles[0][0], np.stack([tile for _, tile in bin_tiles])) for bin_tiles in
+                     zip(*(self.grid.steering_tiles(self.tile_size, float(wavenumber)) for wavenumber in wavenumbers)))
+        else:
+            tiles = self._bin_steering_tiles(np.asarray(wavenumbers))
+
+        spectra = None
+        for start, tile in tiles:
+            powers = self.evaluate(prepared, tile)
+            if spectra is None:
+                spectra = np.empty(powers.shape[:-1] + (num_columns,), dtype=powers.dtype)
+            spectra[..., start:start + tile.shape[-1]] = powers
+        return self.grid.expand_reduced(spectra)
+
+    def _bin_steering_tiles(self, wavenumbers: np.ndarray):
+        # Phases are linear in the wavenumber, so every wavenumber of a tile scales the phases of a unit wavenumber
+        num_columns = self.grid.num_columns
+        tile_size = self.tile_size or num_columns
+        for start in range(0, num_columns, tile_size):
+            angles = self.grid.column_angles(start, start + tile_size)
+            phases = self.structure.positions @ self.structure.wavevector_grid(*angles, 1.).T
+            tile = np.exp(1j * (wavenumbers[:, np.newaxis, np.newaxis] * phases).astype(self.structure.real_dtype))
+            yield start, tile
+
+    def finish(self, spectra: np.ndarray) -> np.ndarray:
+        """
+        Normalize raw spectra along their last axis and extract peaks if asked. Also finishes raw spectra combined
+        outside of the estimator, such as the sum over frequency bins of WidebandEstimator
+        :param spectra: A raw spectrum or a stack of them
+        :return: The output of process
+        """
+        spectra /= np.max(spectra, axis=-1, keepdims=True)
+
+        if self.num_peaks is None:
+            return spectra
+        if spectra.ndim == 1:
+            return self.grid.peaks(spectra, self.num_peaks, interpolate=True)
+
+        # Pad with nan so every spectrum of the batch has num_peaks rows
+        peaks = np.full((spectra.shape[0], self.num_peaks, 3), np.nan)
+        for i, spectrum in enumerate(spectra):
+            found = self.finish(spectrum)
+            peaks[i, :len(found)] = found
+        return peaks
 
     def process(self, data: np.ndarray) -> np.ndarray:
-        # Delay and sum
-        beamformed_data = np.var(self.structure.steering_matrix.conj().T @ data.T, axis=1).real
+        """
+        :param data: The source data. A (batch, samples, channels) stack of blocks is passed to process_batch
+        :return: The normalized spectrum, or peaks if num_peaks is set. One per block for a stack of blocks.
+        """
+        if data.ndim == 3:
+            return self.process_batch(data)
+        return self.process_prepared(self.prepare(data))
+
+    def process_prepared(self, prepared) -> np.ndarray:
+        """
+        Same as process, but from the output of prepare, prepare_covariance, or prepare_decomposition
+        :param prepared: The prepared block, or a prepared stack of blocks
+        :return: The normalized spectrum, or peaks if num_peaks is set
+        """
+        return self.finish(self.evaluate_grid(prepared))
+
+    def process_batch(self, data: np.ndarray, batch_size: int = 16) -> np.ndarray:
+        """
+        Process many blocks at once, for example to reprocess a recording. Covariances, decompositions, and spectra are
+        computed with batched linear algebra, batch_size blocks at a time to bound memory.
+        :param data: A (batch, samples, channels) stack of blocks
+        :param batch_size: The number of blocks per chunk. Memory use grows with batch_size times the grid size
+        :return: A (batch, grid) matrix of spectra, or a (batch, num_peaks, 3) matrix of peaks if num_peaks is set
+        """
+        results = []
+        for start in range(0, data.shape[0], batch_size):
+            cov_matrices = self.estimate_covariance(data[start:start + batch_size])
+            results.append(self.process_prepared(self.prepare_covariance(cov_matrices)))
+        return np.concatenate(results)
 
-        # Normalize
-        beamformed_data /= np.max(beamformed_data)
-        return beamformed_data
+    def process_covariances(self, cov_matrices: np.ndarray, batch_size: int = 16) -> np.ndarray:
+        """
+        Same as process_batch, but from precomputed covariance matrices, for example one per frequency bin
+        :param cov_matrices: A (channels, channels) covariance matrix or a (batch, channels, channels) stack of them
+        :param batch_size: The number of matrices per chunk
+        :return: A spectrum (or peaks) per covariance matrix
+        """
+        cov_matrices = cov_matrices.astype(self.structure.complex_dtype, copy=False)
+        if cov_matrices.ndim == 2:
+            return self.process_prepared(self.prepare_covariance(cov_matrices))
+
+        results = []
+        for start in range(0, cov_matrices.shape[0], batch_size):
+            chunk = cov_matrices[start:start + batch_size]
+            results.append(self.process_prepared(self.prepare_covariance(chunk)))
+        return np.concatenate(results)
 
 
-class BartlettBeamformer(Estimator):
+class BartlettBeamformer(SpectralEstimator):
     """
     Implements a bartlett beamformer
     """
-    def __init__(self, structure: Structure):
-        """
-        :param structure: The steering matrix to utilize to find the sources
-        """
-        super().__init__(structure)
+    def compress(self, prepared: np.ndarray, basis: np.ndarray) -> np.ndarray:
+        # a^H R a = c^H (B^H R B) c for a = B c
+        return basis.conj().T @ prepared @ basis
 
-    def process(self, data: np.ndarray) -> np.ndarray:
+    def evaluate(self, prepared: np.ndarray, steering_matrix: np.ndarray) -> np.ndarray:
         # Bartlett formula
-        cov_matrix = calculate_covariance(data)
-        beamformed_data = np.sum(self.structure.steering_matrix.conj().T *
-                                 (cov_matrix @ self.structure.steering_matrix).T, axis=1).real
+        return np.sum(steering_matrix.conj() * (prepared @ steering_matrix), axis=-2).real
 
-        # Normalize
-        beamformed_data /= np.max(beamformed_data)
-        return beamformed_data
+
+class DelaySumBeamformer(BartlettBeamformer):
+    """
+    Implements a delay-and-sum (conventional) beamformer. The variance of the delayed and summed signal equals a^H R a,
+    so it is computed from the covariance exactly like BartlettBeamformer. The N / (N - 1) factor between np.var and
+    np.cov is removed by normalization.
+    """
 
 
-class MVDRBeamformer(Estimator):
+class MVDRBeamformer(SpectralEstimator):
     """
-    Implements a Minimum Variance Distortionless Response (MVDR) beamformer
+    Implements a Minimum Variance Distortionless Response (MVDR) beamformer. The covariance matrix is factorized once per
+    block as R = L L^H, so the power 1 / (a^H R^-1 a) = 1 / |L^-1 a|^2 of the whole grid is a single matrix product.
     """
-    def __init__(self, structure: Structure):
+    def __init__(self,
+                 structure: Structure,
+                 num_peaks: int = None,
+                 covariance: CovarianceEstimator = None,
+                 tile_size: int = 16384,
+                 diagonal_loading: float = 0.,
+                 region: Region = None):
         """
-        :param structure: The steering matrix to utilize to find the sources
+        :param diagonal_loading: Added to the diagonal of the covariance matrix as a fraction of the average element
+            power. Stabilizes ill-conditioned covariance matrices (few snapshots, coherent sources) at the cost of
+            resolution. Default is 0.
+        The other parameters are described on SpectralEstimator
         """
-        super().__init__(structure)
+        super().__init__(structure, num_peaks, covariance, tile_size, region)
+        self.diagonal_loading = diagonal_loading
 
-    def process(self, data: np.ndarray) -> np.ndarray:
-        # Get covariance
-        cov_matrix = calculate_covariance(data)
+    def prepare_covariance(self, cov_matrix: np.ndarray) -> np.ndarray:
+        num_elements = cov_matrix.shape[-1]
+        if self.diagonal_loading:
+            power = np.trace(cov_matrix, axis1=-2, axis2=-1).real / num_elements
+            cov_matrix = cov_matrix + (self.diagonal_loading * power)[..., np.newaxis, np.newaxis] * \
+                np.eye(num_elements, dtype=cov_matrix.dtype)
 
-        # Find minimum response
-        beamformed_data = 1 / np.sum(
-            self.structure.steering_matrix.conj().T *
-            np.linalg.lstsq(
-                cov_matrix,
-                self.structure.steering_matrix,
-                None)[0].T,
-            axis=1).real
+        # Whitening matrix W with W^H W = R^-1
+        try:
+            return np.linalg.inv(np.linalg.cholesky(cov_matrix))
+        except np.linalg.LinAlgError:
+            # Not positive definite, so fall back to the eigendecomposition
+            return self._whitening(*np.linalg.eigh(cov_matrix))
 
-        # Normalize
-        beamformed_data /= np.max(beamformed_data)
-        return beamformed_data
+    def prepare_decomposition(self, cov_matrix: np.ndarray, eigvals: np.ndarray, eigvecs: np.ndarray) -> np.ndarray:
+        if self.diagonal_loading:
+            # Loading shifts every eigenvalue by the same amount and keeps the eigenvectors
+            eigvals = eigvals + self.diagonal_loading * np.mean(eigvals, axis=-1, keepdims=True)
+        return self._whitening(eigvals, eigvecs)
 
+    @staticmethod
+    def _whitening(eigvals: np.ndarray, eigvecs: np.ndarray) -> np.ndarray:
+        # W = diag(eigvals)^-1/2 V^H, with the smallest eigenvalues clipped so W stays finite
+        floor = np.finfo(eigvals.dtype).eps * np.max(eigvals, axis=-1, keepdims=True)
+        eigvals = np.maximum(eigvals, floor)
+        return np.swapaxes(eigvecs, -1, -2).conj() / np.sqrt(eigvals)[..., np.newaxis]
 
-class Music(Estimator):
+    def evaluate(self, prepared: np.ndarray, steering_matrix: np.ndarray) -> np.ndarray:
+        # Find minimum response
+        return 1 / np.sum(np.abs(prepared @ steering_matrix) ** 2, axis=-2)
+
+
+class Music(SpectralEstimator):
     """
     Implements the MUSIC (MUltiple SIgnal Classification) algorithm
     """
-    def __init__(self, structure: Structure, num_sources: int):
+    uses_decomposition = True
+
+    def __init__(self,
+                 structure: Structure,
+                 num_sources: int,
+                 num_peaks: int = None,
+                 covariance: CovarianceEstimator = None,
+                 tile_size: int = 16384,
+                 region: Region = None):
         """
         :param num_sources: The number of sources to find.
+        The other parameters are described on SpectralEstimator
         """
-        super().__init__(structure)
+        super().__init__(structure, num_peaks, covariance, tile_size, region)
         self.num_sources = num_sources
 
-    def process(self, data: np.ndarray) -> np.ndarray:
-        # Calculate covariance
-        cov_matrix = calculate_covariance(data)
+    def prepare_covariance(self, cov_matrix: np.ndarray) -> np.ndarray:
+        # Get the noise subspace
+        return calculate_noise_subspace(cov_matrix, self.num_sources)
 
-        # Get noise subspace:
-        noise_subspace = calculate_noise_subspace(cov_matrix, self.num_sources)
+    def prepare_decomposition(self, cov_matrix: np.ndarray, eigvals: np.ndarray, eigvecs: np.ndarray) -> np.ndarray:
+        order = np.argsort(eigvals, axis=-1)[..., np.newaxis, :]
+        return np.take_along_axis(eigvecs, order, axis=-1)[..., :-self.num_sources]
 
+    def compress(self, prepared: np.ndarray, basis: np.ndarray) -> np.ndarray:
+        # a^H E_n = c^H (B^H E_n) for a = B c
+        return basis.conj().T @ prepared
+
+    def evaluate(self, prepared: np.ndarray, steering_matrix: np.ndarray) -> np.ndarray:
         # Compute the music spectrum. Use np.sum to take several samples into one result
-        music_spectrum = 1 / np.sum(np.abs(self.structure.steering_matrix.conj().T @ noise_subspace) ** 2, axis=1)
+        return 1 / np.sum(np.abs(np.swapaxes(steering_matrix, -1, -2).conj() @ prepared) ** 2, axis=-1)
+
+
+class SubspaceTrackingMusic(Music):
+    """
+    MUSIC which follows the signal subspace with OPAST (Orthonormal Projection Approximation Subspace Tracking) rather
+    than an eigendecomposition every block. Each snapshot costs O(num_elements * num_sources), and a full
+    eigendecomposition is only done every refresh_interval blocks to stop the tracked subspace from drifting.
+    """
+    def __init__(self,
+                 structure: Structure,
+                 num_sources: int,
+                 forgetting_factor: float = 0.99,
+                 snapshots_per_block: int = 64,
+                 refresh_interval: int = 50,
+                 num_peaks: int = None,
+                 covariance: CovarianceEstimator = None,
+                 tile_size: int = 16384,
+                 region: Region = None):
+        """
+        :param num_sources: The number of sources to find.
+        :param forgetting_factor: The per-snapshot weight of the history, between 0 and 1. Default is 0.99
+        :param snapshots_per_block: The number of evenly spaced snapshots of each block to track with. Default is 64
+        :param refresh_interval: Do a full eigendecomposition every this many blocks. Default is 50
+        The other parameters are described on SpectralEstimator. A covariance estimator is only used for refreshes
+        """
+        super().__init__(structure, num_sources, num_peaks, covariance, tile_size, region)
+        self.forgetting_factor = forgetting_factor
+        self.snapshots_per_block = snapshots_per_block
+        self.refresh_interval = refresh_interval
+
+        # Tracked signal subspace and inverse correlation of its projections
+        self.signal_subspace = None
+        self.inverse_correlation = None
+        self._blocks = 0
+
+    def refresh(self, data: np.ndarray):
+        """
+        Reset the tracked subspace from a full eigendecomposition of the block covariance
+        :param data: The source data
+        :return: None
+        """
+        eigvals, eigvecs = np.linalg.eigh(self.estimate_covariance(data))
+        order = np.argsort(eigvals)[::-1][:self.num_sources]
+        self.signal_subspace = eigvecs[:, order]
+        self.inverse_correlation = np.diag((1 - self.forgetting_factor) / eigvals[order]).astype(eigvecs.dtype)
+
+    def prepare_covariance(self, cov_matrix: np.ndarray) -> np.ndarray:
+        # Precomputed covariances have no stream to track, so take the signal subspace directly. Does not touch the
+        # tracked state
+        return self.prepare_decomposition(cov_matrix, *np.linalg.eigh(cov_matrix))
+
+    def prepare_decomposition(self, cov_matrix: np.ndarray, eigvals: np.ndarray, eigvecs: np.ndarray) -> np.ndarray:
+        order = np.argsort(eigvals, axis=-1)[..., np.newaxis, ::-1][..., :self.num_sources]
+        return np.take_along_axis(eigvecs, order, axis=-1)
+
+    def prepare(self, data: np.ndarray) -> np.ndarray:
+        if self.signal_subspace is None or self._blocks % self.refresh_interval == 0:
+            self.refresh(data)
+        else:
+            if self.covariance is not None:
+                self.covariance.update(data)
+            step = max(data.shape[0] // self.snapshots_per_block, 1)
+            for snapshot in data[::step].astype(self.structure.complex_dtype):
+                self._track(snapshot)
+
+        self._blocks += 1
+        return self.signal_subspace
+
+    def _track(self, snapshot: np.ndarray):
+        """
+        One OPAST update
+        :param snapshot: One sample of every channel
+        :return: None
+        """
+        subspace, inverse = self.signal_subspace, self.inverse_correlation
+        beta = self.forgetting_factor
+
+        y = subspace.conj().T @ snapshot
+        q = inverse @ y / beta
+        gamma = 1 / (1 + np.vdot(y, q).real)
+        p = gamma * (snapshot - subspace @ y)
+        inverse = inverse / beta - gamma * np.outer(q, q.conj())
+
+        # Orthonormalizing correction of the PAST update
+        q_norm = np.vdot(q, q).real
+        tau = (1 / np.sqrt(1 + np.vdot(p, p).real * q_norm) - 1) / q_norm
+        p = tau * (subspace @ q) + (1 + tau * q_norm) * p
+
+        self.signal_subspace = subspace + np.outer(p, q.conj())
+        self.inverse_correlation = inverse
 
-        # Normalize and return results
-        music_spectrum /= np.max(music_spectrum)
-        return music_spectrum
+    def evaluate(self, prepared: np.ndarray, steering_matrix: np.ndarray) -> np.ndarray:
+        # With an orthonormal signal subspace W, |A^H E_n|^2 = |a|^2 - |W^H a|^2, which needs num_sources columns
+        # rather than num_elements - num_sources
+        return 1 / (np.sum(np.abs(steering_matrix) ** 2, axis=-2) -
+                    np.sum(np.abs(np.swapaxes(prepared, -1, -2).conj() @ steering_matrix) ** 2, axis=-2))
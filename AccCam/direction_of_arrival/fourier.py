@@ -0,0 +1,95 @@
+from AccCam.__config__ import __USE_CUPY__
+
+if __USE_CUPY__:
+    import cupy as np
+else:
+    import numpy as np
+
+from AccCam.direction_of_arrival.covariance import CovarianceEstimator
+from AccCam.direction_of_arrival.estimate import BartlettBeamformer
+from AccCam.direction_of_arrival.geometry import Structure
+from AccCam.direction_of_arrival.region import Region
+import math
+
+
+class FFTBeamformer(BartlettBeamformer):
+    """
+    Bartlett (and delay-and-sum) beamformer for elements on a uniform line or planar grid, computed with an FFT rather
+    than a product with the steering matrix. On a lattice, a^H R a only depends on the phase step psi = k . basis along
+    each axis, and is the Fourier series of the coarray of R (the sum of R over every pair of elements with the same
+    index difference). That series is sampled with one zero-padded FFT per block and interpolated onto the grid of the
+    structure, so the cost no longer grows with the number of elements and no steering matrix is built.
+    Gaps in the lattice are allowed. Only the scan of the whole grid uses the FFT; evaluate, and so HierarchicalSearch,
+    TrackingSearch, and scans retuned to another wavenumber, use the steering vectors like BartlettBeamformer.
+    """
+    def __init__(self,
+                 structure: Structure,
+                 num_peaks: int = None,
+                 covariance: CovarianceEstimator = None,
+                 oversampling: int = 32,
+                 region: Region = None):
+        """
+        :param structure: The structure. Its elements must sit on a uniform line or planar grid (see Structure.lattice)
+        :param oversampling: The FFT size per axis relative to the number of coarray lags, rounded up to a power of
+            two. The spectrum is linearly interpolated between FFT samples, so higher values are more accurate.
+            Default is 32.
+        The other parameters are described on SpectralEstimator
+        """
+        if structure.lattice is None:
+            raise ValueError('FFTBeamformer requires elements on a uniform line or planar grid')
+        super().__init__(structure, num_peaks, covariance, None, region)
+        self.oversampling = oversampling
+
+        lattice = structure.lattice
+        self.fft_shape = tuple(2 ** math.ceil(math.log2(oversampling * (2 * size - 1))) for size in lattice.shape)
+        fft_shape = np.array(self.fft_shape)
+
+        # FFT bin of the index difference of every pair of elements, in the same order as the flattened covariance
+        lags = lattice.indices[np.newaxis, :, :] - lattice.indices[:, np.newaxis, :]
+        self.coarray_bins = np.ravel_multi_index(tuple(np.mod(lags, fft_shape).reshape(-1, lattice.rank).T),
+                                                 self.fft_shape)
+
+        # Phase steps of every direction of the grid, as fractional FFT bins
+        inclinations, azimuths = self.grid.grid_angles
+        phases = structure.wavevector_grid(inclinations, azimuths) @ lattice.basis.T
+        positions = np.mod(phases, 2 * np.pi) * fft_shape / (2 * np.pi)
+        lower = np.floor(positions)
+        fractions = (positions - lower).astype(structure.real_dtype)
+        lower = lower.astype(int)
+
+        # Linear interpolation between the 2 (line) or 4 (grid) surrounding bins
+        self.interpolation_bins = []
+        self.interpolation_weights = []
+        for corner in range(2 ** lattice.rank):
+            offsets = np.array([(corner >> axis) & 1 for axis in range(lattice.rank)])
+            self.interpolation_bins.append(np.ravel_multi_index(tuple(np.mod(lower + offsets, fft_shape).T),
+                                                                self.fft_shape))
+            self.interpolation_weights.append(np.prod(np.where(offsets == 1, fractions, 1 - fractions), axis=1))
+
+    def coarray(self, cov_matrix: np.ndarray) -> np.ndarray:
+        """
+        :param cov_matrix: The covariance matrix of the elements
+        :return: The coarray of the covariance matrix laid out for the FFT, with negative lags wrapped around
+        """
+        size = math.prod(self.fft_shape)
+        values = cov_matrix.ravel()
+        coarray = np.bincount(self.coarray_bins, weights=values.real, minlength=size) + \
+            1j * np.bincount(self.coarray_bins, weights=values.imag, minlength=size)
+        return coarray.reshape(self.fft_shape)
+
+    def evaluate_grid(self, cov_matrix: np.ndarray) -> np.ndarray:
+        """
+        Same as SpectralEstimator.evaluate_grid, from one FFT of the coarray rather than the steering matrix
+        :param cov_matrix: The covariance matrix, or a stack of them
+        :return: The raw spectrum over the grid of the structure (or region), or a stack of them
+        """
+        if self.wavenumber not in (None, self.structure.wavenumber):
+            # The interpolation only holds for the wavenumber of the structure
+            return super().evaluate_grid(cov_matrix)
+        if cov_matrix.ndim == 3:
+            return np.stack([self.evaluate_grid(matrix) for matrix in cov_matrix])
+
+        # a^H R a = sum over lags of coarray[lag] * exp(j * psi . lag), which is an inverse FFT up to scale
+        spectrum_samples = np.fft.ifftn(self.coarray(cov_matrix)).real.ravel()
+        return sum(spectrum_samples[bins] * weights
+                   for bins, weights in zip(self.interpolation_bins, self.interpolation_weights))
@@ -5,8 +5,13 @@ if __USE_CUPY__:
 else:
     import numpy as np
 
+from AccCam.direction_of_arrival.cache import SteeringCache, MemoryCache, share_array, attach_array
+from AccCam.direction_of_arrival.peaks import find_peaks, find_scattered_peaks
 from functools import cached_property
+from scipy.spatial import cKDTree
 import matplotlib.pyplot as plt
+import math
+import hashlib
 import logging
 
 logger = logging.getLogger(__name__)
@@ -132,6 +137,36 @@ class WaveVector:
         return self.power ** 0.5
 
 
+class Lattice:
+    """
+    Describes elements which sit on a uniform line or grid: position = origin + indices @ basis
+    """
+    def __init__(self, origin: np.ndarray, basis: np.ndarray, indices: np.ndarray):
+        """
+        :param origin: The position of the lattice point with all indices equal to 0
+        :param basis: A (rank, 3) matrix holding the step between neighbouring elements along each axis of the lattice
+        :param indices: A (num_elements, rank) integer matrix holding the lattice position of every element
+        """
+        self.origin = origin
+        self.basis = basis
+        self.indices = indices
+
+    @property
+    def rank(self):
+        # 1 for a line, 2 for a grid
+        return self.basis.shape[0]
+
+    @property
+    def shape(self):
+        return tuple(int(size) + 1 for size in self.indices.max(axis=0))
+
+    @property
+    def is_complete(self):
+        # True if every point of the lattice holds exactly one element
+        unique = len(set(tuple(int(i) for i in row) for row in self.indices))
+        return unique == len(self.indices) == int(np.prod(np.array(self.shape)))
+
+
 class Structure:
     """
     Defines a structure made of Elements. Computes its associated steering matrix and other properties.
@@ -145,6 +180,15 @@ class Structure:
                  azimuth_range: tuple[float, float] = (0, 2 * np.pi),
                  inclination_resolution: int = 500,
                  azimuth_resolution: int = 500,
+                 steering_chunk_size: int = None,
+                 cache: SteeringCache = None,
+                 precision: str = 'double',
+                 reduce_grid: bool = False,
+                 grid: str = 'meshgrid',
+                 lazy_steering: bool = False,
+                 tile_cache_bytes: int = 0,
+                 wavenumber_cache_bytes: int = 1024 ** 3,
+                 steering_rank_tolerance: float = None,
                  ):
         """
         :param elements: The elements in the structure. Index must match that of the recorder the structure is linked
@@ -154,7 +198,41 @@ class Structure:
         :param azimuth_range: The azimuths to scan. Default is (0, 2pi)
         :param inclination_resolution: The number of angles to scan for on the inclination axis. Default is 500.
         :param azimuth_resolution: The number of angles to scan for on the azimuth axis. Default is 500.
+        :param steering_chunk_size: If provided, build the steering matrix this many angles at a time to bound the
+            memory used by temporaries. Default is all angles at once.
+        :param cache: If provided, load the steering matrix from this cache, or save it there after computing it
+        :param precision: 'double' (complex128) or 'single' (complex64). Single precision halves the memory and
+            memory bandwidth of the steering matrix and of the estimator products over it, at the cost of accuracy.
+            Estimators compute in the precision of their structure. Default is 'double'.
+        :param reduce_grid: If true and the elements sit on a line or a plane, only compute one steering vector per
+            group of directions the array cannot tell apart (see grid_reduction). The steering matrix then holds one
+            column per group, and estimators expand their spectra back to the whole grid. Default is False.
+        :param grid: How to lay out the scanned directions.
+            - meshgrid: every combination of inclination_values and azimuth_values
+            - fibonacci: directions spread evenly over the sphere along a Fibonacci spiral, with the spacing of the
+              coarser axis of the meshgrid. The meshgrid crowds directions near the poles, so this needs far fewer
+              steering vectors for the same resolution. Spectra have one value per direction, see equirectangular
+            Default is 'meshgrid'.
+        :param lazy_steering: If true, estimators never build the whole steering matrix. steering_tiles computes every
+            tile on demand instead, so scans of grids or arrays too large for memory run within the memory of a tile
+            (steering_chunk_size steering vectors if no tile size is given). Default is False.
+        :param tile_cache_bytes: With lazy_steering, keep the most recently computed tiles up to this many bytes and
+            reuse them on the next scan, dropping the least recently used tiles first. Default is 0 (no cache).
+        :param wavenumber_cache_bytes: Keep the steering matrices of other wavenumbers than wavenumber (see
+            steering_matrix_at) up to this many bytes, dropping the least recently used matrices first. Default is
+            1 GiB.
+        :param steering_rank_tolerance: If provided, also factor the steering matrix into a basis and coefficients of
+            the lowest rank whose relative error is below this tolerance (see steering_factors). Bartlett, delay-and-sum
+            and MUSIC then scan the coefficients rather than the steering matrix, which is faster when the array is
+            small compared to the wavelength. Default is None, which scans the steering matrix.
         """
+        if precision not in ('single', 'double'):
+            raise ValueError(f"precision must be 'single' or 'double', got {precision}")
+        if grid not in ('meshgrid', 'fibonacci'):
+            raise ValueError(f"grid must be 'meshgrid' or 'fibonacci', got {grid}")
+        if grid == 'fibonacci' and min(inclination_resolution, azimuth_resolution) < 2:
+            raise ValueError('A fibonacci grid needs a resolution of at least 2 on both axes')
+
         # Physical properties
         self.elements = elements
 
@@ -168,6 +246,20 @@ class Structure:
         self.azimuth_range = azimuth_range
         self.inclination_resolution = inclination_resolution
         self.azimuth_resolution = azimuth_resolution
+        self.steering_chunk_size = steering_chunk_size
+        self.cache = cache
+        self.precision = precision
+        self.reduce_grid = reduce_grid
+        self.grid = grid
+        self.lazy_steering = lazy_steering
+        self.tile_cache = MemoryCache(tile_cache_bytes)
+        self.wavenumber_cache = MemoryCache(wavenumber_cache_bytes)
+        self.steering_rank_tolerance = steering_rank_tolerance
+
+        # Shared memory
+        self.shared_name = None
+        self._shared_layout = None
+        self._shared_memory = None
 
     @cached_property
     def samplerate(self):
@@ -186,6 +278,19 @@ class Structure:
     def azimuth_values(self):
         return np.linspace(*self.azimuth_range, self.azimuth_resolution)
 
+    @cached_property
+    def grid_shape(self):
+        # The (azimuths, inclinations) shape of the image of equirectangular, for both grids
+        return len(self.azimuth_values), len(self.inclination_values)
+
+    @cached_property
+    def complex_dtype(self):
+        return np.complex64 if self.precision == 'single' else np.complex128
+
+    @cached_property
+    def real_dtype(self):
+        return np.float32 if self.precision == 'single' else np.float64
+
     @cached_property
     def positions(self):
         return np.array([element.position for element in self.elements])
@@ -200,27 +305,396 @@ class Structure:
         ks = np.vstack([wv.k for wv in wavevectors])
 
         # Efficiently calculate steering vector using broadcasting
-        return np.exp(1j * ks @ self.positions.T)
+        # Keep the matmul real and only convert its result to complex
+        return np.exp(1j * (ks @ self.positions.T))
 
     @cached_property
-    def steering_matrix(self):
-        # Create 3D grid of inclination and azimuth. This gives every combination of angles on a grid
+    def grid_angles(self):
+        # Every direction of the grid, in the same order as the steering matrix
+        if self.grid == 'fibonacci':
+            return self._fibonacci_angles()
+
+        # Every combination of inclination and azimuth, flattened azimuth-major
         inclinations_mesh, azimuths_mesh = np.meshgrid(self.inclination_values, self.azimuth_values)
+        return inclinations_mesh.ravel(), azimuths_mesh.ravel()
+
+    def _fibonacci_angles(self):
+        """
+        :return: The inclinations and azimuths of a Fibonacci spiral over the ranges of the structure
+        """
+        spacing = max((max(self.inclination_range) - min(self.inclination_range)) / (self.inclination_resolution - 1),
+                      (max(self.azimuth_range) - min(self.azimuth_range)) / (self.azimuth_resolution - 1))
+        top, bottom = math.cos(min(self.inclination_range)), math.cos(max(self.inclination_range))
+        azimuth_span = min(max(self.azimuth_range) - min(self.azimuth_range), 2 * math.pi)
+
+        # Spread over the whole band of inclinations, then keep the azimuths of the range
+        num_band = math.ceil((top - bottom) * 2 * math.pi / spacing ** 2)
+        index = np.arange(num_band)
+        inclinations = np.arccos(top - (index + 0.5) / num_band * (top - bottom))
+        azimuths = np.mod(min(self.azimuth_range) + index * math.pi * (3 - math.sqrt(5)), 2 * math.pi)
+        keep = np.mod(azimuths - min(self.azimuth_range), 2 * math.pi) <= azimuth_span
+        return inclinations[keep], azimuths[keep]
+
+    @cached_property
+    def neighbours(self):
+        """
+        :return: A (num_directions, 8) matrix of the nearest directions of every direction of a Fibonacci grid, or None
+            for a meshgrid
+        """
+        if self.grid != 'fibonacci':
+            return None
+        directions = self.wavevector_grid(*self.grid_angles) / self.wavenumber
+        if __USE_CUPY__:
+            directions = directions.get()
+        _, neighbours = cKDTree(directions).query(directions, k=9)
+        return np.asarray(neighbours[:, 1:])
+
+    @cached_property
+    def equirectangular_index(self):
+        # The nearest direction of the grid to every pixel of the inclination_values x azimuth_values image
+        inclinations_mesh, azimuths_mesh = np.meshgrid(self.inclination_values, self.azimuth_values)
+        pixels = self.wavevector_grid(inclinations_mesh.ravel(), azimuths_mesh.ravel()) / self.wavenumber
+        directions = self.wavevector_grid(*self.grid_angles) / self.wavenumber
+        if __USE_CUPY__:
+            pixels, directions = pixels.get(), directions.get()
+        return np.asarray(cKDTree(directions).query(pixels)[1])
+
+    def equirectangular(self, spectra: np.ndarray) -> np.ndarray:
+        """
+        Resample spectra onto the inclination_values x azimuth_values image used by plotters and ResultsToDisk. Does
+        nothing for a meshgrid, which already has that layout
+        :param spectra: A spectrum of an estimator, or a stack of them
+        :return: The spectra with one value per pixel, flattened azimuth-major like a meshgrid spectrum
+        """
+        if self.grid != 'fibonacci':
+            return spectra
+        return spectra[..., self.equirectangular_index]
+
+    def peaks(self, spectrum: np.ndarray, num_peaks: int, interpolate: bool = False) -> np.ndarray:
+        """
+        Find the strongest peaks of a spectrum over the grid, see find_peaks and find_scattered_peaks
+        :param spectrum: A spectrum of an estimator
+        :param num_peaks: The maximum number of peaks to return
+        :param interpolate: If true, refine peaks between directions of the grid
+        :return: A (num_peaks, 3) matrix of (inclination, azimuth, power) rows, strongest first
+        """
+        if self.grid == 'fibonacci':
+            return find_scattered_peaks(spectrum, self.neighbours, *self.grid_angles, num_peaks, interpolate)
+        return find_peaks(spectrum, self.inclination_values, self.azimuth_values, num_peaks, interpolate)
+
+    def wavevector_grid(self, inclinations: np.ndarray, azimuths: np.ndarray, wavenumber: float = None) -> np.ndarray:
+        """
+        Calculates the wavevectors of the structure's wavenumber for several directions at once
+        :param inclinations: The inclinations of the wavevectors
+        :param azimuths: The azimuths of the wavevectors. Must be the same size as inclinations
+        :param wavenumber: If provided, use this wavenumber rather than the structure's
+        :return: A (len(inclinations), 3) matrix of (kx, ky, kz) rows
+        """
+        wavenumber = self.wavenumber if wavenumber is None else wavenumber
+        sin_inclinations = np.sin(inclinations)
+        return wavenumber * np.stack([sin_inclinations * np.cos(azimuths),
+                                      sin_inclinations * np.sin(azimuths),
+                                      np.cos(inclinations)], axis=-1)
 
-        # Convert inclination and azimuth to spherical coordinates
-        spherical_coords = np.array([self.wavenumber * np.ones_like(inclinations_mesh.ravel()),  # Wave number
-                                     inclinations_mesh.ravel(),                                  # inclination
-                                     azimuths_mesh.ravel()]).T                                   # azimuth
-        cartesian_coords = spherical_to_cartesian(spherical_coords)
+    def steering_vectors(self, inclinations: np.ndarray, azimuths: np.ndarray, wavenumber: float = None) -> np.ndarray:
+        """
+        Calculates steering vectors for several directions at once without creating WaveVector objects
+        :param inclinations: The inclinations of the steering vectors
+        :param azimuths: The azimuths of the steering vectors. Must be the same size as inclinations
+        :param wavenumber: If provided, use this wavenumber rather than the structure's
+        :return: A (num_elements, len(inclinations)) matrix with one steering vector per column, in the precision of the
+            structure
+        """
+        # Phases are computed in double precision and only rounded before the exponential
+        phases = self.wavevector_grid(inclinations, azimuths, wavenumber) @ self.positions.T
+        return np.exp(1j * phases.astype(self.real_dtype)).T
 
-        # Convert spherical coordinates to wave vectors for each set of angles. Wave speed does not matter here
-        wavevectors = (WaveVector(coord, 1) for coord in cartesian_coords)
+    @cached_property
+    def lattice(self):
+        """
+        Detects elements sitting on a uniform line or planar grid
+        :return: A Lattice, or None if the elements do not form a 1D or 2D lattice
+        """
+        tolerance = 1e-6
+        positions = self.positions
+        if len(positions) < 2:
+            return None
+
+        # Candidate steps are the differences between elements, shortest first
+        differences = (positions[:, np.newaxis, :] - positions[np.newaxis, :, :]).reshape(-1, 3)
+        lengths = np.linalg.norm(differences, axis=1)
+        differences = differences[lengths > tolerance]
+        differences = differences[np.argsort(np.linalg.norm(differences, axis=1))]
+        rank = int(np.linalg.matrix_rank(positions - positions[0], tolerance))
+        if rank not in (1, 2):
+            return None
+
+        # The shortest difference, then the shortest one not parallel to it, span the lattice
+        basis = [differences[0]]
+        for difference in differences[1:]:
+            if len(basis) == rank:
+                break
+            if np.linalg.matrix_rank(np.stack(basis + [difference]), tolerance) > len(basis):
+                basis.append(difference)
+        basis = np.stack(basis)
+
+        # Point every step towards its largest positive component so indices grow along the axes
+        signs = np.sign(basis[np.arange(rank), np.argmax(np.abs(basis), axis=1)])
+        basis = basis * signs[:, np.newaxis]
+
+        # Every element must sit on an integer multiple of the basis
+        coordinates = np.linalg.lstsq(basis.T, (positions - positions[0]).T, None)[0].T
+        indices = np.round(coordinates)
+        if np.max(np.abs(coordinates - indices)) > 1e-3:
+            return None
+        indices = indices.astype(int)
+        minimum = indices.min(axis=0)
+
+        return Lattice(positions[0] + minimum @ basis, basis, indices - minimum)
+
+    @property
+    def is_uniform_linear(self):
+        # True for a uniform linear array without gaps
+        return self.lattice is not None and self.lattice.rank == 1 and self.lattice.is_complete
+
+    @property
+    def is_uniform_rectangular(self):
+        # True for a uniform planar grid of elements without gaps
+        return self.lattice is not None and self.lattice.rank == 2 and self.lattice.is_complete
 
-        # Calculate steering vectors for all elements and all set of angles
-        steering_vectors = self.steering_vector(wavevectors).T
+    @cached_property
+    def geometry_hash(self):
+        # Identifies the steering matrix. Anything the steering matrix depends on must be part of the hash
+        positions = self.positions.get() if __USE_CUPY__ else self.positions
+        description = repr((float(self.wavenumber),
+                            tuple(float(value) for value in self.inclination_range),
+                            tuple(float(value) for value in self.azimuth_range),
+                            self.inclination_resolution,
+                            self.azimuth_resolution,
+                            self.precision,
+                            self.reduce_grid,
+                            self.grid))
+        digest = hashlib.sha256(description.encode())
+        digest.update(positions.astype('<f8').tobytes())
+        return digest.hexdigest()
 
-        # Reshape the 3d matrix to 2d for DoA algorithms
-        return steering_vectors
+    @cached_property
+    def steering_matrix(self):
+        if self.shared_name is not None:
+            self._shared_memory, matrix = attach_array(self.shared_name, *self._shared_layout)
+            return np.asarray(matrix)
+
+        if self.cache is None:
+            return self._compute_steering_matrix()
+
+        matrix = self.cache.load(self.geometry_hash)
+        if matrix is None:
+            matrix = self._compute_steering_matrix()
+            self.cache.save(self.geometry_hash, matrix.get() if __USE_CUPY__ else matrix)
+        return np.asarray(matrix)
+
+    def steering_matrix_at(self, wavenumber: float = None) -> np.ndarray:
+        """
+        The steering matrix of the same grid for another wavenumber, for example to follow a source whose frequency
+        changes between blocks. Matrices of other wavenumbers are kept in wavenumber_cache, so returning to a recent
+        wavenumber costs nothing. Wavenumbers are matched exactly, so snap detected frequencies to FFT bins (or another
+        fixed set) to get hits. A reduced grid (see grid_reduction) keeps the groups found at the structure's
+        wavenumber.
+        :param wavenumber: The wavenumber. Default is the wavenumber of the structure, which returns steering_matrix
+        :return: The steering matrix, with the same layout as steering_matrix
+        """
+        if wavenumber is None or wavenumber == self.wavenumber:
+            return self.steering_matrix
+        return self.wavenumber_cache.get(float(wavenumber), lambda: self._compute_steering_matrix(wavenumber))
+
+    @cached_property
+    def grid_reduction(self):
+        """
+        Groups the directions of the grid which have the same steering vector. The response of a linear array only
+        depends on the angle to its axis, and the response of a planar array is mirrored about its plane, so most of the
+        grid is redundant for them. Directions are grouped by their projection onto the line or plane of the elements,
+        with a step small enough that merged directions differ by at most 1e-3 radians of phase. Steering vectors of a
+        group can differ by a phase common to every element, which no spectrum depends on.
+        :return: The grid index of one direction per group and the group of every direction of the grid, or None if
+            reduce_grid is false or the elements span all three dimensions
+        """
+        if not self.reduce_grid:
+            return None
+
+        centered = self.positions - np.mean(self.positions, axis=0, keepdims=True)
+        _, singular_values, axes = np.linalg.svd(centered)
+        rank = int(np.sum(singular_values > 1e-9 * max(float(np.max(singular_values)), 1e-300)))
+        if rank == 3:
+            return None
+
+        inclinations, azimuths = self.grid_angles
+        if rank == 0:
+            return np.zeros(1, dtype=int), np.zeros(inclinations.size, dtype=int)
+
+        # Quantized coordinates of every direction along the axes of the array
+        radius = float(np.max(np.linalg.norm(centered, axis=1)))
+        step = 1e-3 / (self.wavenumber * radius)
+        coordinates = self.wavevector_grid(inclinations, azimuths) @ axes[:rank].T / self.wavenumber
+        keys = np.round(coordinates / step).astype(np.int64)
+
+        # Sort so equal keys are neighbours, then number the runs of equal keys
+        order = np.lexsort(keys.T)
+        sorted_keys = keys[order]
+        starts = np.concatenate([np.ones(1, dtype=bool), np.any(sorted_keys[1:] != sorted_keys[:-1], axis=1)])
+        inverse = np.empty(inclinations.size, dtype=int)
+        inverse[order] = np.cumsum(starts) - 1
+        return order[starts], inverse
+
+    @cached_property
+    def steering_factors(self):
+        """
+        A low-rank factorization of the steering matrix, A ~ basis @ coefficients. The basis holds the leading
+        eigenvectors of A A^H (the left singular vectors of A), so every steering vector is approximated by its
+        projection onto them, and quadratic forms a^H R a become c^H (basis^H R basis) c with rank rather than
+        num_elements terms. The rank is the lowest whose relative Frobenius error is below steering_rank_tolerance.
+        Computed tile by tile, so lazy_steering structures do not build the steering matrix.
+        :return: The (num_elements, rank) basis and the (rank, num_columns) coefficients, or None if
+            steering_rank_tolerance is not set
+        """
+        if self.steering_rank_tolerance is None:
+            return None
+
+        gram = np.zeros((len(self.elements), len(self.elements)), dtype=np.complex128)
+        for _, tile in self.steering_tiles(self.steering_chunk_size):
+            gram += tile @ tile.conj().T
+        eigvals, eigvecs = np.linalg.eigh(gram)
+        eigvals, eigvecs = eigvals[::-1], eigvecs[:, ::-1]
+
+        # The squared error of keeping rank vectors is the sum of the eigenvalues left out
+        left_out = np.concatenate([np.cumsum(eigvals[::-1])[::-1][1:], np.zeros(1)])
+        rank = int(np.argmax(left_out <= self.steering_rank_tolerance ** 2 * np.sum(eigvals))) + 1
+        basis = eigvecs[:, :rank].astype(self.complex_dtype)
+
+        # Stored as (columns, rank) and returned transposed so every coefficient vector is contiguous, like the
+        # steering matrix
+        coefficients = np.empty((self.num_columns, rank), dtype=self.complex_dtype)
+        for start, tile in self.steering_tiles(self.steering_chunk_size):
+            coefficients[start:start + tile.shape[1]] = (basis.conj().T @ tile).T
+        logger.info(f'Steering matrix factored to rank {rank} of {len(self.elements)}')
+        return basis, coefficients.T
+
+    def expand_reduced(self, spectra: np.ndarray) -> np.ndarray:
+        """
+        Expand spectra over the columns of the steering matrix to the whole grid. Does nothing if the grid is not
+        reduced (see grid_reduction)
+        :param spectra: A spectrum with one value per column of the steering matrix, or a stack of them
+        :return: The spectra with the layout of the grid
+        """
+        if self.grid_reduction is None:
+            return spectra
+        return spectra[..., self.grid_reduction[1]]
+
+    @property
+    def num_columns(self):
+        # The number of steering vectors (columns of the steering matrix), without building it
+        if self.grid_reduction is not None:
+            return len(self.grid_reduction[0])
+        return self.grid_angles[0].size
+
+    def column_angles(self, start: int = 0, end: int = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        :param start: The first column of the steering matrix
+        :param end: One past the last column. Default is the last column
+        :return: The inclinations and azimuths of the steering vectors of these columns
+        """
+        inclinations, azimuths = self.grid_angles
+        if self.grid_reduction is not None:
+            representatives = self.grid_reduction[0][start:end]
+            return inclinations[representatives], azimuths[representatives]
+        return inclinations[start:end], azimuths[start:end]
+
+    def steering_tiles(self, tile_size: int = None, wavenumber: float = None):
+        """
+        Iterates over the steering matrix in tiles of neighbouring columns. Tiles are views, so no memory is copied.
+        With lazy_steering, tiles are computed on demand (or taken from tile_cache) and the steering matrix is never
+        built, unless it already was.
+        :param tile_size: The number of steering vectors per tile. Default is the whole matrix as one tile, or
+            steering_chunk_size steering vectors with lazy_steering
+        :param wavenumber: If provided, iterate over the steering matrix of this wavenumber, see steering_matrix_at
+        :return: A generator of (start, tile) pairs where tile holds the steering vectors from column start onwards
+        """
+        if wavenumber == self.wavenumber:
+            wavenumber = None
+        if self.lazy_steering and (wavenumber is not None or 'steering_matrix' not in self.__dict__):
+            num_columns = self.num_columns
+            tile_size = tile_size or self.steering_chunk_size or num_columns
+            for start in range(0, num_columns, tile_size):
+                end = min(start + tile_size, num_columns)
+                yield start, self.tile_cache.get(
+                    (wavenumber, start, end),
+                    lambda: self.steering_vectors(*self.column_angles(start, end), wavenumber=wavenumber))
+            return
+
+        matrix = self.steering_matrix_at(wavenumber)
+        tile_size = tile_size or matrix.shape[1]
+        for start in range(0, matrix.shape[1], tile_size):
+            yield start, matrix[:, start:start + tile_size]
+
+    def _compute_steering_matrix(self, wavenumber: float = None):
+        inclinations, azimuths = self.column_angles()
+        chunk_size = self.steering_chunk_size or inclinations.size
+
+        # Fill the matrix one chunk of angles at a time so temporaries stay the size of a chunk. Stored as
+        # (angles, elements) and returned transposed so every steering vector is contiguous in memory
+        steering_vectors = np.empty((inclinations.size, len(self.elements)), dtype=self.complex_dtype)
+        for start in range(0, inclinations.size, chunk_size):
+            end = start + chunk_size
+            steering_vectors[start:end] = self.steering_vectors(inclinations[start:end], azimuths[start:end],
+                                                                wavenumber).T
+
+        return steering_vectors.T
+
+    def share(self):
+        """
+        Publish the steering matrix into named shared memory. Once shared, pickled copies of the structure (for example
+        the ones sent to stage processes) attach to the same memory read-only instead of carrying their own copy.
+        Call before starting stages, and call unshare() from the same process when done.
+        :return: None
+        """
+        if self.shared_name is not None:
+            return
+
+        matrix = self.steering_matrix.get() if __USE_CUPY__ else self.steering_matrix
+        self._shared_memory, shared = share_array(matrix)
+        self.shared_name = self._shared_memory.name
+        self._shared_layout = (shared.shape, shared.dtype.str, 'F' if shared.flags['F_CONTIGUOUS'] else 'C')
+        if not __USE_CUPY__:
+            self.steering_matrix = shared
+
+        logger.info(f'Steering matrix of {shared.nbytes} bytes shared as {self.shared_name}')
+
+    def unshare(self):
+        """
+        Release the shared memory created by share(). Structures attached to it in other processes must not be used
+        afterwards.
+        :return: None
+        """
+        if self._shared_memory is None:
+            return
+
+        if not __USE_CUPY__:
+            self.__dict__.pop('steering_matrix', None)
+        self._shared_memory.close()
+        self._shared_memory.unlink()
+        self._shared_memory = None
+        self.shared_name = None
+        self._shared_layout = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # Shared and cached steering matrices and the grid are cheap to get back, so they are not copied into the pickle
+        if self.shared_name is not None or self.cache is not None:
+            state.pop('steering_matrix', None)
+        state.pop('grid_angles', None)
+        state.pop('neighbours', None)
+        state.pop('equirectangular_index', None)
+        state['_shared_memory'] = None
+        return state
 
     def simulate_audio(self, wavevectors: tuple[WaveVector], random_phase: bool = True) -> np.ndarray:
         # Randomize phase
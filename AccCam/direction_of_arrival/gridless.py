@@ -0,0 +1,265 @@
+from AccCam.__config__ import __USE_CUPY__
+
+if __USE_CUPY__:
+    import cupy as np
+else:
+    import numpy as np
+
+from AccCam.direction_of_arrival.estimate import Estimator, calculate_covariance
+from AccCam.direction_of_arrival.geometry import Structure
+import numpy
+import math
+
+
+def directions_to_angles(directions: np.ndarray) -> np.ndarray:
+    """
+    Convert unit direction vectors to angles
+    :param directions: A (n, 3) matrix of unit vectors
+    :return: A (n, 2) matrix of (inclination, azimuth) rows
+    """
+    return np.stack([np.arccos(np.clip(directions[:, 2], -1, 1)),
+                     np.mod(np.arctan2(directions[:, 1], directions[:, 0]), 2 * np.pi)], axis=-1)
+
+
+def plane_directions(basis: np.ndarray, phases: np.ndarray) -> np.ndarray:
+    """
+    Find the directions of plane waves from their phase steps along the axes of a planar array. Waves from both sides of
+    the plane look the same to the array, so the waves are assumed to come from the side facing +z (or +y, then +x, for
+    arrays in a vertical plane).
+    :param basis: A (2, 3) matrix of the steps between neighbouring elements along the axes of the array, times the
+        wavenumber
+    :param phases: A (n, 2) matrix of the phase step along each axis for every wave
+    :return: A (n, 3) matrix of unit vectors
+    """
+    normal = np.cross(basis[0], basis[1])
+    normal /= np.linalg.norm(normal)
+    for axis in (2, 1, 0):
+        if np.abs(normal[axis]) > 1e-9:
+            normal *= np.sign(normal[axis])
+            break
+
+    # Minimum norm solution lies in the plane of the array, the rest of the unit vector is along the normal
+    in_plane = np.linalg.lstsq(basis, phases.T, None)[0].T
+    out_of_plane = np.sqrt(np.clip(1 - np.sum(in_plane ** 2, axis=1), 0, None))
+    directions = in_plane + out_of_plane[:, np.newaxis] * normal[np.newaxis, :]
+    return directions / np.linalg.norm(directions, axis=1, keepdims=True)
+
+
+class RootMusic(Estimator):
+    """
+    Implements Root-MUSIC for uniform linear arrays. Rather than scanning a grid, the source angles are found by rooting
+    the MUSIC polynomial, so they are exact to the precision of the covariance rather than the grid spacing.
+    Real-valued recordings hold every source and its mirror image (k and -k), so use an analytic signal or expect
+    mirrored angles.
+    """
+    def __init__(self, structure: Structure, num_sources: int):
+        """
+        :param structure: The structure. Must be a uniform linear array without gaps (see Structure.is_uniform_linear)
+        :param num_sources: The number of sources to find
+        """
+        if not structure.is_uniform_linear:
+            raise ValueError('RootMusic requires a uniform linear array')
+        super().__init__(structure)
+        self.num_sources = num_sources
+
+        # Element order along the array axis and the phase per element per unit of cos(angle)
+        lattice = structure.lattice
+        self.order = np.argsort(lattice.indices[:, 0])
+        self.phase_scale = structure.wavenumber * np.linalg.norm(lattice.basis[0])
+
+    def process(self, data: np.ndarray) -> np.ndarray:
+        """
+        :param data: The source data
+        :return: The angles in radians between the array axis (Structure.lattice.basis[0]) and each source. The closest
+            roots to the unit circle, i.e. the strongest sources, come first.
+        """
+        cov_matrix = calculate_covariance(data)[self.order][:, self.order]
+        num_elements = cov_matrix.shape[0]
+
+        # Noise subspace projector. The MUSIC denominator a^H C a along the array is a polynomial in z = exp(j * psi)
+        # whose coefficients are the sums of the diagonals of C
+        eigvals, eigvecs = np.linalg.eigh(cov_matrix)
+        noise_subspace = eigvecs[:, np.argsort(eigvals)][:, :num_elements - self.num_sources]
+        projector = noise_subspace @ noise_subspace.conj().T
+        coefficients = np.array([np.trace(projector, offset=m) for m in range(num_elements - 1, -num_elements, -1)])
+
+        # Roots come in pairs mirrored about the unit circle. Keep the inside ones closest to it
+        if __USE_CUPY__:
+            coefficients = coefficients.get()
+        roots = numpy.roots(coefficients)
+        roots = roots[numpy.abs(roots) <= 1]
+        roots = roots[numpy.argsort(1 - numpy.abs(roots))][:self.num_sources]
+
+        return np.arccos(np.clip(np.asarray(numpy.angle(roots)) / self.phase_scale, -1, 1))
+
+
+class Esprit(Estimator):
+    """
+    Implements least-squares ESPRIT for uniform linear arrays and uniform planar grids. Source directions come from the
+    rotational invariance between shifted sub-arrays, so no grid is scanned.
+    Real-valued recordings hold every source and its mirror image (k and -k), so use an analytic signal or expect
+    mirrored directions.
+    """
+    def __init__(self, structure: Structure, num_sources: int):
+        """
+        :param structure: The structure. Must be a uniform linear array or a uniform planar grid without gaps (see
+            Structure.is_uniform_linear and Structure.is_uniform_rectangular)
+        :param num_sources: The number of sources to find
+        """
+        if not (structure.is_uniform_linear or structure.is_uniform_rectangular):
+            raise ValueError('Esprit requires a uniform linear array or a uniform planar grid')
+        super().__init__(structure)
+        self.num_sources = num_sources
+
+        # Pairs of sub-arrays shifted by one element along each axis of the lattice
+        lattice = structure.lattice
+        lookup = {tuple(int(i) for i in index): element for element, index in enumerate(lattice.indices)}
+        self.subarrays = []
+        for axis in range(lattice.rank):
+            step = tuple(int(axis == a) for a in range(lattice.rank))
+            first = [element for index, element in lookup.items() if index[axis] < lattice.shape[axis] - 1]
+            second = [lookup[tuple(i + s for i, s in zip(lattice.indices[element], step))] for element in first]
+            self.subarrays.append((np.array(first), np.array(second)))
+        self.scaled_basis = structure.wavenumber * lattice.basis
+
+    def process(self, data: np.ndarray) -> np.ndarray:
+        """
+        :param data: The source data
+        :return: For linear arrays, the angles in radians between the array axis (Structure.lattice.basis[0]) and each
+            source. For planar grids, a (num_sources, 2) matrix of (inclination, azimuth) rows.
+        """
+        # Signal subspace
+        eigvals, eigvecs = np.linalg.eigh(calculate_covariance(data))
+        signal_subspace = eigvecs[:, np.argsort(eigvals)][:, -self.num_sources:]
+
+        # Rotation between each pair of sub-arrays
+        rotations = [np.linalg.lstsq(signal_subspace[first], signal_subspace[second], None)[0]
+                     for first, second in self.subarrays]
+
+        # The rotations share eigenvectors. Take them from a combination of all rotations so eigenvalues stay paired
+        combination = sum(rotation * weight for rotation, weight in zip(rotations, (1, 0.618)))
+        _, eigenvectors = np.linalg.eig(combination)
+        inverse = np.linalg.inv(eigenvectors)
+        phases = np.stack([np.angle(np.diag(inverse @ rotation @ eigenvectors)) for rotation in rotations], axis=-1)
+
+        if len(rotations) == 1:
+            return np.arccos(np.clip(phases[:, 0] / np.linalg.norm(self.scaled_basis[0]), -1, 1))
+        return directions_to_angles(plane_directions(self.scaled_basis, phases))
+
+
+class GccPhat(Estimator):
+    """
+    Locates the strongest source from the time differences of arrival (TDOA) between every pair of elements, for coarse
+    localization where scanning a steering matrix costs too much, such as on low-power nodes. Every pair is
+    cross-correlated with PHAT weighting (the cross-spectrum is whitened to unit magnitude, so the correlation peak is
+    sharp for broadband sources), all pairs at once with one batched FFT. The peak of each pair is refined between
+    samples with a parabola, and the direction u solves tau_ij = u . (r_j - r_i) / wave_speed by least squares.
+    Needs broadband sources, as a single tone gives no unique correlation peak. Works with any array geometry.
+    """
+    def __init__(self,
+                 structure: Structure,
+                 wave_speed: float = 343,
+                 frequency_range: tuple[float, float] = None):
+        """
+        :param structure: The structure. Element positions must be in meters, and the samplerate is taken from it
+        :param wave_speed: The speed of the wave in meters per second. Default is 343
+        :param frequency_range: If provided, only use the (min, max) frequencies in Hz, for example to ignore noise
+            outside the band of the sources. Default is every frequency
+        """
+        super().__init__(structure)
+        self.wave_speed = wave_speed
+        self.frequency_range = frequency_range
+
+        positions = structure.positions
+        self.pairs = np.array([(i, j) for i in range(len(positions)) for j in range(i + 1, len(positions))])
+        if len(self.pairs) == 0:
+            raise ValueError('GccPhat requires at least two elements')
+        self.differences = (positions[self.pairs[:, 1]] - positions[self.pairs[:, 0]]) / wave_speed
+
+        # Lags a pair can see, in samples, from its spacing. One more on each side for the parabola
+        self.max_lags = np.linalg.norm(self.differences, axis=1) * structure.samplerate
+        self.max_lag = int(np.ceil(np.max(self.max_lags))) + 1
+
+        # The directions the TDOAs can tell apart span the rows of the differences
+        _, singular_values, axes = np.linalg.svd(self.differences)
+        self.rank = int(np.sum(singular_values > 1e-9 * singular_values[0]))
+        self.axes = axes[:self.rank]
+        if self.rank == 1:
+            # Point the axis towards its largest positive component, like Structure.lattice
+            self.axes = self.axes * np.sign(self.axes[0, np.argmax(np.abs(self.axes[0]))])
+
+    def delays(self, data: np.ndarray) -> np.ndarray:
+        """
+        :param data: The source data with one sample per row and one element per column
+        :return: The time difference of arrival in seconds of every pair in self.pairs
+        """
+        # One row per element so every FFT runs over contiguous memory. Zero padded by at least max_lag so the lags
+        # which are kept do not wrap around
+        signals = np.ascontiguousarray(data.T)
+        size = 2 ** math.ceil(math.log2(signals.shape[1] + self.max_lag))
+        if np.isrealobj(signals):
+            spectra = np.fft.rfft(signals, size)
+            frequencies = np.fft.rfftfreq(size, 1 / self.structure.samplerate)
+        else:
+            spectra = np.fft.fft(signals, size)
+            frequencies = np.fft.fftfreq(size, 1 / self.structure.samplerate)
+
+        # PHAT weights every cross-spectrum to unit magnitude. As |X_i X_j^*| = |X_i| |X_j|, whitening every element
+        # once is the same and much cheaper than whitening every pair
+        spectra /= np.maximum(np.abs(spectra), 1e-30)
+        if self.frequency_range is not None:
+            frequencies = np.abs(frequencies)
+            spectra *= (frequencies >= min(self.frequency_range)) & (frequencies <= max(self.frequency_range))
+
+        # Pairs are ordered by their first element, so every element fills one run of rows against all later elements.
+        # Much faster than gathering both sides of every pair
+        conjugates = spectra.conj()
+        cross_spectra = np.empty((len(self.pairs), spectra.shape[1]), dtype=spectra.dtype)
+        row = 0
+        for first in range(len(spectra) - 1):
+            count = len(spectra) - first - 1
+            np.multiply(spectra[first], conjugates[first + 1:], out=cross_spectra[row:row + count])
+            row += count
+        if np.isrealobj(signals):
+            correlations = np.fft.irfft(cross_spectra, size)
+        else:
+            correlations = np.fft.ifft(cross_spectra).real
+
+        # Only the lags a pair can physically see, negative lags wrap around
+        lags = np.arange(-self.max_lag, self.max_lag + 1)
+        correlations = correlations[:, lags].T
+        correlations = np.where(np.abs(lags)[:, np.newaxis] <= self.max_lags[np.newaxis, :] + 1, correlations, -np.inf)
+
+        # Parabolic refinement around the peak of every pair, peaks on the edge are kept as they are
+        best = np.argmax(correlations, axis=0)
+        columns = np.arange(len(self.pairs))
+        peak = correlations[best, columns]
+        before = correlations[np.clip(best - 1, 0, len(lags) - 1), columns]
+        after = correlations[np.clip(best + 1, 0, len(lags) - 1), columns]
+        valid = np.isfinite(before) & np.isfinite(after) & (best > 0) & (best < len(lags) - 1)
+        before = np.where(valid, before, peak)
+        after = np.where(valid, after, peak)
+        curvature = before - 2 * peak + after
+        valid &= curvature < 0
+        offset = np.where(valid, 0.5 * (before - after) / np.where(valid, curvature, -1), 0)
+
+        return (lags[best] + np.clip(offset, -0.5, 0.5)) / self.structure.samplerate
+
+    def process(self, data: np.ndarray) -> np.ndarray:
+        """
+        :param data: The source data
+        :return: For linear arrays, the angle in radians between the array axis and the source, as a vector of one.
+            Otherwise a (1, 2) matrix of (inclination, azimuth). Planar arrays place the source on the side facing +z,
+            like Esprit.
+        """
+        delays = self.delays(data)
+
+        # Least squares coordinates of the direction along the axes the pairs span
+        coordinates = np.linalg.lstsq(self.differences @ self.axes.T, delays, None)[0]
+
+        if self.rank == 1:
+            return np.arccos(np.clip(coordinates, -1, 1))
+        if self.rank == 2:
+            return directions_to_angles(plane_directions(self.axes, coordinates[np.newaxis, :]))
+        direction = coordinates @ self.axes
+        return directions_to_angles((direction / np.linalg.norm(direction))[np.newaxis, :])
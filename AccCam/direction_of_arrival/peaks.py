@@ -0,0 +1,171 @@
+from AccCam.__config__ import __USE_CUPY__
+
+if __USE_CUPY__:
+    import cupy as np
+else:
+    import numpy as np
+
+
+def _is_full_circle(azimuth_values: np.ndarray) -> tuple[bool, bool]:
+    """
+    :return: Whether the evenly spaced azimuths cover the whole circle, and whether the last azimuth repeats the first
+        one, as with the default azimuth_range of (0, 2 pi)
+    """
+    if len(azimuth_values) < 3:
+        return False, False
+    step = float(azimuth_values[1] - azimuth_values[0])
+    span = float(azimuth_values[-1] - azimuth_values[0])
+    if abs(span - 2 * np.pi) < 0.5 * abs(step):
+        return True, True
+    return abs(span + step - 2 * np.pi) < 0.5 * abs(step), False
+
+
+def _pole_columns(inclination_values: np.ndarray) -> list[int]:
+    """
+    :return: The indices of the inclinations which lie on a pole, where every azimuth is the same direction
+    """
+    return [index for index in {0, len(inclination_values) - 1}
+            if np.isclose(float(inclination_values[index]), 0, atol=1e-9) or
+            np.isclose(float(inclination_values[index]), np.pi, atol=1e-9)]
+
+
+def find_peaks(spectrum: np.ndarray,
+               inclination_values: np.ndarray,
+               azimuth_values: np.ndarray,
+               num_peaks: int,
+               interpolate: bool = False) -> np.ndarray:
+    """
+    Find the strongest local maxima of a spectrum laid out on an inclination x azimuth grid. If the azimuths cover the
+    whole circle, the azimuth axis wraps around so a source on the seam is found once, and a repeated endpoint such as
+    2 pi is dropped. All azimuths of an inclination of 0 or pi are one direction, and give at most one peak.
+    :param spectrum: The flattened spectrum of an estimator. Must have the same layout as the steering matrix, that is
+        azimuth-major with a length of len(azimuth_values) * len(inclination_values)
+    :param inclination_values: The inclinations of the grid
+    :param azimuth_values: The azimuths of the grid
+    :param num_peaks: The maximum number of peaks to return
+    :param interpolate: If true, refine every peak between grid points by fitting a parabola through the peak and its
+        neighbours along each axis. Assumes evenly spaced angles.
+    :return: A (num_peaks, 3) matrix of (inclination, azimuth, power) rows, strongest first. Fewer rows are returned
+        if the spectrum has less local maxima than num_peaks.
+    """
+    grid = spectrum.reshape(len(azimuth_values), len(inclination_values))
+    periodic, repeated = _is_full_circle(azimuth_values)
+    if repeated:
+        grid, azimuth_values = grid[:-1], azimuth_values[:-1]
+
+    # A pole is a single direction, so every azimuth on it takes the strongest value when compared to its neighbours
+    poles = _pole_columns(inclination_values) if len(azimuth_values) > 1 else []
+    compared = grid.copy()
+    for pole in poles:
+        compared[:, pole] = np.max(grid[:, pole])
+
+    # Wrap the azimuth axis if it is periodic, and pad with -inf so the other edges are compared only against real
+    # neighbours
+    if periodic:
+        padded = np.pad(compared, ((1, 1), (0, 0)), mode='wrap')
+    else:
+        padded = np.pad(compared, ((1, 1), (0, 0)), mode='constant', constant_values=-np.inf)
+    padded = np.pad(padded, ((0, 0), (1, 1)), mode='constant', constant_values=-np.inf)
+    is_peak = np.ones(grid.shape, dtype=bool)
+    for d_az in (-1, 0, 1):
+        for d_inc in (-1, 0, 1):
+            if d_az == 0 and d_inc == 0:
+                continue
+            neighbour = padded[1 + d_az:padded.shape[0] - 1 + d_az, 1 + d_inc:padded.shape[1] - 1 + d_inc]
+            # Break ties towards the earlier neighbour, so a plateau gives a single peak
+            is_peak &= (grid > neighbour) if (d_az, d_inc) < (0, 0) else (grid >= neighbour)
+
+    # Keep only the strongest azimuth of every pole, compared against the whole neighbouring ring
+    for pole in poles:
+        ring = pole + 1 if pole == 0 else pole - 1
+        strongest = int(np.argmax(grid[:, pole]))
+        pole_is_peak = len(inclination_values) == 1 or bool(grid[strongest, pole] >= np.max(grid[:, ring]))
+        is_peak[:, pole] = False
+        is_peak[strongest, pole] = pole_is_peak
+
+    # Keep the strongest peaks
+    candidates = np.flatnonzero(is_peak.ravel())
+    candidates = candidates[np.argsort(grid.ravel()[candidates])[::-1][:num_peaks]]
+    az_index, inc_index = np.unravel_index(candidates, grid.shape)
+    inclinations = inclination_values[inc_index]
+    azimuths = azimuth_values[az_index]
+    powers = grid.ravel()[candidates]
+
+    if interpolate:
+        # Offsets in grid steps of the vertex of a parabola through each peak and its neighbours on both axes
+        offsets = []
+        for axis, values in ((1, inclination_values), (0, azimuth_values)):
+            step = [0, 0]
+            step[axis] = 1
+            before = padded[az_index + 1 - step[0], inc_index + 1 - step[1]]
+            after = padded[az_index + 1 + step[0], inc_index + 1 + step[1]]
+            # Peaks on the edge of the grid have no parabola. Flatten them so no -inf reaches the arithmetic
+            valid = np.isfinite(before) & np.isfinite(after)
+            if axis == 0:
+                # Nor do peaks on a pole along the azimuth
+                valid &= ~np.isin(inc_index, poles)
+            before = np.where(valid, before, powers)
+            after = np.where(valid, after, powers)
+            curvature = before - 2 * powers + after
+            valid &= curvature < 0
+            offset = np.where(valid, 0.5 * (before - after) / np.where(valid, curvature, -1), 0)
+            offset = np.clip(offset, -0.5, 0.5)
+            spacing = values[1] - values[0] if len(values) > 1 else 0
+            offsets.append((offset, spacing, np.where(valid, before - after, 0)))
+
+        (inc_offset, inc_spacing, inc_slope), (az_offset, az_spacing, az_slope) = offsets
+        inclinations = inclinations + inc_offset * inc_spacing
+        azimuths = azimuths + az_offset * az_spacing
+        if periodic:
+            azimuths = np.mod(azimuths - azimuth_values[0], 2 * np.pi) + azimuth_values[0]
+        powers = powers - 0.25 * (inc_slope * inc_offset + az_slope * az_offset)
+
+    return np.stack([inclinations, azimuths, powers], axis=-1)
+
+
+def find_scattered_peaks(spectrum: np.ndarray,
+                         neighbours: np.ndarray,
+                         inclinations: np.ndarray,
+                         azimuths: np.ndarray,
+                         num_peaks: int,
+                         interpolate: bool = False) -> np.ndarray:
+    """
+    Find the strongest local maxima of a spectrum over directions which are not laid out on a grid, such as the
+    Fibonacci grid of a Structure
+    :param spectrum: The spectrum of an estimator, one value per direction
+    :param neighbours: A (num_directions, n) integer matrix holding the nearest directions of every direction
+    :param inclinations: The inclination of every direction
+    :param azimuths: The azimuth of every direction
+    :param num_peaks: The maximum number of peaks to return
+    :param interpolate: If true, move every peak to the centroid of it and its neighbours, weighted by how far their
+        powers rise above the weakest of them
+    :return: A (num_peaks, 3) matrix of (inclination, azimuth, power) rows, strongest first. Fewer rows are returned
+        if the spectrum has less local maxima than num_peaks.
+    """
+    is_peak = spectrum >= np.max(spectrum[neighbours], axis=1)
+
+    # Keep the strongest peaks
+    candidates = np.flatnonzero(is_peak)
+    candidates = candidates[np.argsort(spectrum[candidates])[::-1][:num_peaks]]
+    peak_inclinations = inclinations[candidates]
+    peak_azimuths = azimuths[candidates]
+    powers = spectrum[candidates]
+
+    if interpolate and len(candidates) > 0:
+        group = np.concatenate([candidates[:, np.newaxis], neighbours[candidates]], axis=1)
+        weights = spectrum[group] - np.min(spectrum[group], axis=1, keepdims=True)
+        sin_inclinations = np.sin(inclinations[group])
+        directions = np.stack([sin_inclinations * np.cos(azimuths[group]),
+                               sin_inclinations * np.sin(azimuths[group]),
+                               np.cos(inclinations[group])], axis=-1)
+        centroids = np.sum(weights[..., np.newaxis] * directions, axis=1)
+        norms = np.linalg.norm(centroids, axis=1)
+
+        # Peaks whose neighbours are all as strong stay where they are
+        valid = norms > 0
+        centroids = centroids / np.where(valid, norms, 1)[:, np.newaxis]
+        peak_inclinations = np.where(valid, np.arccos(np.clip(centroids[:, 2], -1, 1)), peak_inclinations)
+        peak_azimuths = np.where(valid, np.mod(np.arctan2(centroids[:, 1], centroids[:, 0]), 2 * np.pi),
+                                 peak_azimuths)
+
+    return np.stack([peak_inclinations, peak_azimuths, powers], axis=-1)
@@ -0,0 +1,194 @@
+from AccCam.__config__ import __USE_CUPY__
+
+if __USE_CUPY__:
+    import cupy as np
+else:
+    import numpy as np
+
+from AccCam.direction_of_arrival.cache import MemoryCache
+from AccCam.direction_of_arrival.geometry import Structure
+from AccCam.direction_of_arrival.peaks import find_peaks, _is_full_circle
+from functools import cached_property
+
+
+class Region:
+    """
+    A rectangular window of the grid of a structure, such as the field of view of a camera. Give one to an estimator to
+    scan only these directions, without rebuilding the structure. Has the same grid properties as a Structure
+    (inclination_values, azimuth_values, grid_shape, grid_angles, steering_matrix, steering_tiles), so it can be given
+    to stages which read the grid, such as PeakPicker and ResultsToDisk, in place of the structure.
+    """
+    def __init__(self,
+                 structure: Structure,
+                 inclination_window: tuple[float, float] = None,
+                 azimuth_window: tuple[float, float] = None,
+                 max_resolution: tuple[int, int] = None):
+        """
+        :param structure: The structure whose grid to take the window of
+        :param inclination_window: The (min, max) inclinations to keep. Default is every inclination of the structure
+        :param azimuth_window: The (start, end) azimuths to keep. If the structure covers the whole circle, a window with
+            start > end, or reaching below 0 or above 2 pi, wraps across 0 / 2 pi, for example (5.9, 0.4) or
+            (-0.4, 0.4) for a camera facing azimuth 0. Default is every azimuth of the structure
+        :param max_resolution: If provided, the maximum number of (azimuths, inclinations) to keep. Angles of the
+            window are skipped evenly to fit, for example to match the resolution of a display. Default keeps every
+            angle of the window.
+        """
+        if structure.grid != 'meshgrid':
+            raise ValueError('Regions can only be taken of a meshgrid structure')
+        self.structure = structure
+        self.inclination_window = inclination_window
+        self.azimuth_window = azimuth_window
+        self.max_resolution = max_resolution
+        self.wavenumber_cache = MemoryCache(structure.wavenumber_cache.max_bytes)
+
+        self.inclination_indices = self._window_indices(structure.inclination_values, inclination_window,
+                                                        None if max_resolution is None else max_resolution[1])
+        self.azimuth_indices = self._window_indices(structure.azimuth_values, azimuth_window,
+                                                    None if max_resolution is None else max_resolution[0], wrap=True)
+        if len(self.inclination_indices) == 0 or len(self.azimuth_indices) == 0:
+            raise ValueError(f'The region {inclination_window} x {azimuth_window} holds no angles of the structure')
+
+    @classmethod
+    def from_camera(cls, structure: Structure, camera):
+        """
+        The region seen by a camera
+        :param structure: The structure whose grid to take the window of
+        :param camera: Anything with inclination_fov, azimuth_fov, and output_resolution, such as visual.Camera
+        :return: A Region covering the field of view with at most as many angles as the camera has pixels
+        """
+        return cls(structure, camera.inclination_fov, camera.azimuth_fov, camera.output_resolution)
+
+    @staticmethod
+    def _window_indices(values: np.ndarray, window: tuple[float, float], max_count: int,
+                        wrap: bool = False) -> np.ndarray:
+        indices = np.arange(len(values))
+        periodic, repeated = _is_full_circle(values) if wrap else (False, False)
+        if window is not None and periodic and (window[0] > window[1] or window[0] < values[0] or
+                                                window[1] > values[-1]):
+            # The window crosses 0 / 2 pi, so walk around the circle from its start to its end. A repeated 2 pi is the
+            # same direction as 0 and is left out
+            if repeated:
+                indices = indices[:-1]
+            offsets = np.mod(values[indices] - window[0], 2 * np.pi)
+            width = np.mod(window[1] - window[0], 2 * np.pi)
+            indices = indices[np.argsort(offsets)]
+            indices = indices[np.sort(offsets) <= width + 1e-9]
+        elif window is not None:
+            indices = indices[(values >= min(window)) & (values <= max(window))]
+        if max_count is not None and len(indices) > max_count:
+            indices = indices[np.round(np.linspace(0, len(indices) - 1, max_count)).astype(int)]
+        return indices
+
+    @cached_property
+    def inclination_values(self):
+        return self.structure.inclination_values[self.inclination_indices]
+
+    @cached_property
+    def azimuth_values(self):
+        return self.structure.azimuth_values[self.azimuth_indices]
+
+    @cached_property
+    def grid_shape(self):
+        return len(self.azimuth_indices), len(self.inclination_indices)
+
+    @cached_property
+    def columns(self):
+        # Columns of the structure's steering matrix in the region, in the same azimuth-major order
+        return (self.azimuth_indices[:, np.newaxis] * self.structure.inclination_resolution +
+                self.inclination_indices[np.newaxis, :]).ravel()
+
+    @cached_property
+    def grid_angles(self):
+        inclinations, azimuths = self.structure.grid_angles
+        return inclinations[self.columns], azimuths[self.columns]
+
+    @cached_property
+    def steering_matrix(self):
+        # Slice the structure's matrix if it is already built, otherwise only compute the directions of the region
+        if 'steering_matrix' in self.structure.__dict__ and self.structure.grid_reduction is None:
+            return np.asfortranarray(self.structure.steering_matrix[:, self.columns])
+        return self.structure.steering_vectors(*self.grid_angles)
+
+    @property
+    def num_columns(self):
+        return len(self.columns)
+
+    def column_angles(self, start: int = 0, end: int = None) -> tuple[np.ndarray, np.ndarray]:
+        # The angles of the region's steering vectors, see Structure.column_angles
+        inclinations, azimuths = self.grid_angles
+        return inclinations[start:end], azimuths[start:end]
+
+    @cached_property
+    def steering_factors(self):
+        # The structure's factorization with the coefficients of the region's directions, see Structure.steering_factors
+        if self.structure.steering_factors is None:
+            return None
+        basis, coefficients = self.structure.steering_factors
+        columns = self.columns
+        if self.structure.grid_reduction is not None:
+            columns = self.structure.grid_reduction[1][columns]
+        return basis, np.asfortranarray(coefficients[:, columns])
+
+    def steering_matrix_at(self, wavenumber: float = None) -> np.ndarray:
+        """
+        Same as Structure.steering_matrix_at, over the steering vectors of the region. Only the directions of the region
+        are computed, and kept in the region's own wavenumber_cache
+        """
+        if wavenumber is None or wavenumber == self.structure.wavenumber:
+            return self.steering_matrix
+        return self.wavenumber_cache.get(float(wavenumber),
+                                         lambda: self.structure.steering_vectors(*self.grid_angles, wavenumber))
+
+    def steering_tiles(self, tile_size: int = None, wavenumber: float = None):
+        """
+        Same as Structure.steering_tiles, over the steering vectors of the region. Tiles are computed on demand if the
+        structure has lazy_steering, unless the steering matrix of the region was already built.
+        """
+        if wavenumber == self.structure.wavenumber:
+            wavenumber = None
+        if self.structure.lazy_steering and (wavenumber is not None or 'steering_matrix' not in self.__dict__):
+            inclinations, azimuths = self.grid_angles
+            tile_size = tile_size or self.structure.steering_chunk_size or self.num_columns
+            for start in range(0, self.num_columns, tile_size):
+                yield start, self.structure.steering_vectors(inclinations[start:start + tile_size],
+                                                             azimuths[start:start + tile_size], wavenumber)
+            return
+
+        matrix = self.steering_matrix_at(wavenumber)
+        tile_size = tile_size or matrix.shape[1]
+        for start in range(0, matrix.shape[1], tile_size):
+            yield start, matrix[:, start:start + tile_size]
+
+    def equirectangular(self, spectra: np.ndarray) -> np.ndarray:
+        # Already laid out as an image, see Structure.equirectangular
+        return spectra
+
+    def peaks(self, spectrum: np.ndarray, num_peaks: int, interpolate: bool = False) -> np.ndarray:
+        """
+        Same as Structure.peaks, over the grid of the region
+        """
+        return find_peaks(spectrum, self.inclination_values, self.azimuth_values, num_peaks, interpolate)
+
+    def expand_reduced(self, spectra: np.ndarray) -> np.ndarray:
+        # Regions are never reduced, see Structure.expand_reduced
+        return spectra
+
+    def expand(self, spectrum: np.ndarray, fill: float = 0.) -> np.ndarray:
+        """
+        Place the spectrum of the region into the whole grid of the structure, for example to plot it
+        :param spectrum: A spectrum of the region
+        :param fill: The value of the directions outside of the region. Default is 0
+        :return: A spectrum with the layout of the structure's steering matrix
+        """
+        expanded = np.full(self.structure.azimuth_resolution * self.structure.inclination_resolution, fill,
+                           dtype=spectrum.dtype)
+        expanded[self.columns] = spectrum
+        return expanded
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # Cheap to get back from the structure, which handles its own steering matrix
+        state.pop('steering_matrix', None)
+        state.pop('grid_angles', None)
+        state.pop('steering_factors', None)
+        return state
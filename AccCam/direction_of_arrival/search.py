@@ -0,0 +1,330 @@
+from AccCam.__config__ import __USE_CUPY__
+
+if __USE_CUPY__:
+    import cupy as np
+else:
+    import numpy as np
+
+from AccCam.direction_of_arrival.estimate import SpectralEstimator
+from AccCam.direction_of_arrival.peaks import find_peaks, _is_full_circle
+from functools import cached_property
+
+
+def _spacing(angle_range: tuple[float, float], resolution: int) -> float:
+    """
+    :return: The distance between two neighbouring angles of a linspace, or 0 if there is only one angle
+    """
+    if resolution < 2:
+        return 0.
+    return (angle_range[1] - angle_range[0]) / (resolution - 1)
+
+
+class HierarchicalSearch:
+    """
+    Coarse-to-fine peak search for a SpectralEstimator. Scans a coarse grid over the ranges of the structure, then
+    repeatedly zooms in around the strongest peaks until the target resolution is reached. Use when only the positions
+    of the sources are needed rather than the whole spectrum. The cost per block is the coarse grid plus
+    num_peaks * refine_points ** 2 directions per level instead of the whole grid of the structure. If the azimuth range
+    is the whole circle, the coarse grid and the patches wrap around it.
+    """
+    def __init__(self,
+                 estimator: SpectralEstimator,
+                 num_peaks: int,
+                 coarse_resolution: tuple[int, int] = (20, 40),
+                 target_resolution: tuple[float, float] = None,
+                 refine_points: int = 5):
+        """
+        :param estimator: The estimator to search with
+        :param num_peaks: The number of peaks to find and refine
+        :param coarse_resolution: The number of (inclinations, azimuths) of the coarse grid. Axes of the structure with
+            a single angle keep a single angle. Default is (20, 40).
+        :param target_resolution: The (inclination, azimuth) spacing in radians to refine to. Default is the spacing of
+            the structure's grid, which gives the same accuracy as a full scan.
+        :param refine_points: The number of angles per axis of each refinement patch. Must be odd so the previous best
+            angle is part of the patch. Each level shrinks the spacing by (refine_points - 1) / 2. Default is 5.
+        """
+        structure = estimator.structure
+        if refine_points < 3 or refine_points % 2 == 0:
+            raise ValueError(f'refine_points must be odd and at least 3, got {refine_points}')
+
+        self.estimator = estimator
+        self.num_peaks = num_peaks
+        self.refine_points = refine_points
+        self.coarse_resolution = (coarse_resolution[0] if structure.inclination_resolution > 1 else 1,
+                                  coarse_resolution[1] if structure.azimuth_resolution > 1 else 1)
+        self.full_circle = self.coarse_resolution[1] > 1 and _is_full_circle(structure.azimuth_values)[0]
+
+        # Around the whole circle the last coarse azimuth would repeat the first, so it is left out
+        self.coarse_spacing = (_spacing(structure.inclination_range, self.coarse_resolution[0]),
+                               2 * np.pi / self.coarse_resolution[1] if self.full_circle else
+                               _spacing(structure.azimuth_range, self.coarse_resolution[1]))
+
+        self.target_resolution = target_resolution
+        if self.target_resolution is None:
+            self.target_resolution = (_spacing(structure.inclination_range, structure.inclination_resolution),
+                                      _spacing(structure.azimuth_range, structure.azimuth_resolution))
+        for spacing, target in zip(self.coarse_spacing, self.target_resolution):
+            if spacing > 0 and target <= 0:
+                raise ValueError(f'target_resolution must be positive, got {self.target_resolution}')
+
+    @cached_property
+    def coarse_inclination_values(self):
+        return np.linspace(*self.estimator.structure.inclination_range, self.coarse_resolution[0])
+
+    @cached_property
+    def coarse_azimuth_values(self):
+        return np.linspace(*self.estimator.structure.azimuth_range, self.coarse_resolution[1],
+                           endpoint=not self.full_circle)
+
+    @cached_property
+    def coarse_steering_matrix(self):
+        return self._coarse_steering_vectors()
+
+    def _coarse_steering_vectors(self, wavenumber: float = None):
+        inclinations_mesh, azimuths_mesh = np.meshgrid(self.coarse_inclination_values, self.coarse_azimuth_values)
+        return self.estimator.structure.steering_vectors(inclinations_mesh.ravel(), azimuths_mesh.ravel(), wavenumber)
+
+    def process(self, data: np.ndarray) -> np.ndarray:
+        """
+        Find the sources in a block of data
+        :param data: The source data
+        :return: A (num_peaks, 3) matrix of (inclination, azimuth, power) rows, strongest first. Powers are normalized
+            to the strongest peak. Fewer rows are returned if the coarse grid has fewer peaks, or if peaks refine to
+            within one coarse spacing of a stronger one.
+        """
+        structure = self.estimator.structure
+        prepared = self.estimator.prepare(data)
+
+        # Coarse scan
+        if self.estimator.wavenumber in (None, structure.wavenumber):
+            coarse_steering_matrix = self.coarse_steering_matrix
+        else:
+            # Small enough to recompute whenever the estimator is retuned
+            coarse_steering_matrix = self._coarse_steering_vectors(self.estimator.wavenumber)
+        coarse_spectrum = self.estimator.evaluate(prepared, coarse_steering_matrix)
+        peaks = find_peaks(coarse_spectrum, self.coarse_inclination_values, self.coarse_azimuth_values, self.num_peaks)
+
+        # Refine around every peak at once until the target resolution is reached
+        spacing = np.array(self.coarse_spacing)
+        target = np.array(self.target_resolution)
+        offsets = np.linspace(-1, 1, self.refine_points)
+        lower = np.array([min(structure.inclination_range), min(structure.azimuth_range)])
+        upper = np.array([max(structure.inclination_range), max(structure.azimuth_range)])
+
+        while np.any(spacing > target):
+            # Patch of refine_points x refine_points angles spanning one previous spacing on each side of every peak
+            inclinations = peaks[:, 0, np.newaxis, np.newaxis] + spacing[0] * offsets[np.newaxis, np.newaxis, :]
+            azimuths = peaks[:, 1, np.newaxis, np.newaxis] + spacing[1] * offsets[np.newaxis, :, np.newaxis]
+            inclinations, azimuths = np.broadcast_arrays(inclinations, azimuths)
+            inclinations = np.clip(inclinations, lower[0], upper[0]).reshape(len(peaks), -1)
+            if self.full_circle:
+                azimuths = np.mod(azimuths - lower[1], 2 * np.pi).reshape(len(peaks), -1) + lower[1]
+            else:
+                azimuths = np.clip(azimuths, lower[1], upper[1]).reshape(len(peaks), -1)
+
+            steering_matrix = structure.steering_vectors(inclinations.ravel(), azimuths.ravel(),
+                                                         self.estimator.wavenumber)
+            powers = self.estimator.evaluate(prepared, steering_matrix).reshape(len(peaks), -1)
+
+            best = np.argmax(powers, axis=1)
+            rows = np.arange(len(peaks))
+            peaks = np.stack([inclinations[rows, best], azimuths[rows, best], powers[rows, best]], axis=-1)
+            spacing = spacing * 2 / (self.refine_points - 1)
+
+        # Strongest first, dropping peaks which refined onto a stronger one
+        peaks = peaks[np.argsort(peaks[:, 2])[::-1]]
+        sin_inclinations = np.sin(peaks[:, 0])
+        directions = np.stack([sin_inclinations * np.cos(peaks[:, 1]), sin_inclinations * np.sin(peaks[:, 1]),
+                               np.cos(peaks[:, 0])], axis=-1)
+        angles = np.arccos(np.clip(directions @ directions.T, -1, 1))
+        keep = []
+        for index in range(len(peaks)):
+            if all(angles[index, kept] >= max(self.coarse_spacing) for kept in keep):
+                keep.append(index)
+        peaks = peaks[keep]
+        peaks[:, 2] /= np.max(peaks[:, 2])
+        return peaks
+
+
+class TrackingSearch:
+    """
+    Follows slowly moving sources from block to block instead of scanning the whole grid every block. Every source has
+    an alpha-beta filter on its (inclination, azimuth), and only a small patch of directions around the predicted
+    position of each source is evaluated. The whole grid is scanned on the first block, every full_scan_interval
+    blocks, and whenever a track is lost, which is when its power drops below min_power of its power at the last full
+    scan or its best direction is on the edge of its patch.
+    """
+    def __init__(self,
+                 estimator: SpectralEstimator,
+                 num_sources: int,
+                 window: tuple[float, float] = None,
+                 patch_points: int = 11,
+                 full_scan_interval: int = 50,
+                 alpha: float = 0.5,
+                 beta: float = 0.1,
+                 min_power: float = 0.5):
+        """
+        :param estimator: The estimator to search with
+        :param num_sources: The number of sources to track
+        :param window: The (inclination, azimuth) distance in radians from the prediction to the edge of each patch.
+            Default is 5 grid spacings of the structure
+        :param patch_points: The number of angles per axis of each patch. Must be odd so the prediction is part of
+            the patch. Default is 11, which with the default window gives the spacing of the structure's grid
+        :param full_scan_interval: Scan the whole grid every this many blocks. Default is 50
+        :param alpha: The weight of the measured position against the predicted position, between 0 and 1. Default is
+            0.5
+        :param beta: The weight of the measured velocity against the tracked velocity, between 0 and 1. Default is 0.1
+        :param min_power: The power, relative to the power at the last full scan, below which a track is lost.
+            Default is 0.5
+        """
+        structure = estimator.structure
+        if patch_points < 3 or patch_points % 2 == 0:
+            raise ValueError(f'patch_points must be odd and at least 3, got {patch_points}')
+
+        self.estimator = estimator
+        self.num_sources = num_sources
+        self.patch_points = patch_points
+        self.full_scan_interval = full_scan_interval
+        self.alpha = alpha
+        self.beta = beta
+        self.min_power = min_power
+
+        self.full_circle = _is_full_circle(estimator.grid.azimuth_values)[0]
+        self.window = window
+        if self.window is None:
+            self.window = (5 * _spacing(structure.inclination_range, structure.inclination_resolution),
+                           5 * _spacing(structure.azimuth_range, structure.azimuth_resolution))
+
+        # Track state, one row per source
+        self.positions = None       # (inclination, azimuth)
+        self.velocities = None      # Change of (inclination, azimuth) per block
+        self.reference_powers = None
+        self._blocks = 0
+
+    def reset(self):
+        """
+        Forget all tracks. The next block is scanned fully
+        :return: None
+        """
+        self.positions = None
+        self.velocities = None
+        self.reference_powers = None
+        self._blocks = 0
+
+    def full_scan(self, prepared) -> np.ndarray:
+        """
+        Scan the whole grid and restart the tracks from its peaks. Velocities are kept for tracks which match a peak
+        :param prepared: The output of the estimator's prepare
+        :return: A (num_peaks, 3) matrix of raw (inclination, azimuth, power) rows
+        """
+        grid = self.estimator.grid
+        spectrum = self.estimator.evaluate_grid(prepared)
+        peaks = grid.peaks(spectrum, self.num_sources, interpolate=True)
+
+        velocities = np.zeros((len(peaks), 2))
+        if self.positions is not None and len(self.positions) > 0:
+            # Each peak keeps the velocity of its nearest previous track
+            differences = peaks[:, np.newaxis, :2] - self.positions[np.newaxis, :, :]
+            if self.full_circle:
+                differences[..., 1] = np.mod(differences[..., 1] + np.pi, 2 * np.pi) - np.pi
+            distances = np.linalg.norm(differences, axis=-1)
+            velocities = self.velocities[np.argmin(distances, axis=1)]
+
+        self.positions = peaks[:, :2].copy()
+        self.velocities = velocities
+        self.reference_powers = peaks[:, 2].copy()
+        return peaks
+
+    def _limit(self,
+               inclinations: np.ndarray,
+               azimuths: np.ndarray,
+               wrap: bool = True) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Clip angles to the grid full_scan searches, that is the region of the estimator if it has one, otherwise the
+        structure. Azimuths are measured around the circle from the first azimuth of the grid, so windows which cross
+        0 / 2 pi work, and angles outside of the grid move to its nearest end. A grid around the whole circle is never
+        clipped in azimuth, so tracks can cross 0 and 2 pi
+        :param inclinations: Any array of inclinations
+        :param azimuths: Any array of azimuths
+        :param wrap: If true, wrap the azimuths into [0, 2 pi). Otherwise they stay monotonic along a patch
+        :return: The clipped inclinations and azimuths
+        """
+        grid = self.estimator.grid
+        inclinations = np.clip(inclinations, np.min(grid.inclination_values), np.max(grid.inclination_values))
+
+        start = grid.azimuth_values[0]
+        offsets = np.mod(azimuths - start, 2 * np.pi)
+        if not self.full_circle:
+            width = np.mod(grid.azimuth_values[-1] - start, 2 * np.pi)
+            nearer_start = 2 * np.pi - offsets < offsets - width
+            offsets = np.where(offsets > width, np.where(nearer_start, 0, width), offsets)
+        elif not wrap:
+            return inclinations, azimuths
+        azimuths = start + offsets
+        return inclinations, np.mod(azimuths, 2 * np.pi) if wrap else azimuths
+
+    def local_search(self, prepared):
+        """
+        Evaluate a patch around the predicted position of every track and update the filters. Patches are clipped to
+        the grid full_scan searches
+        :param prepared: The output of the estimator's prepare
+        :return: A (num_sources, 3) matrix of raw (inclination, azimuth, power) rows, and whether every track is kept
+        """
+        structure = self.estimator.structure
+        predictions = np.column_stack(self._limit(*(self.positions + self.velocities).T))
+
+        # Patches of every track at once, azimuth-major like the grid of the structure
+        offsets = np.linspace(-1, 1, self.patch_points)
+        inclination_values, azimuth_values = self._limit(
+            predictions[:, 0, np.newaxis] + self.window[0] * offsets[np.newaxis, :],
+            predictions[:, 1, np.newaxis] + self.window[1] * offsets[np.newaxis, :], wrap=False)
+        inclinations, azimuths = np.broadcast_arrays(inclination_values[:, np.newaxis, :],
+                                                     azimuth_values[:, :, np.newaxis])
+
+        steering_matrix = structure.steering_vectors(inclinations.ravel(), azimuths.ravel(), self.estimator.wavenumber)
+        powers = self.estimator.evaluate(prepared, steering_matrix).reshape(len(predictions), -1)
+
+        peaks = []
+        kept = True
+        for track, patch in enumerate(powers):
+            best = int(np.argmax(patch))
+            az_index, inc_index = divmod(best, self.patch_points)
+            # An edge clipped to the end of the grid repeats its neighbour, and the source may rest there
+            on_edge = False
+            for index, values in ((az_index, azimuth_values[track]), (inc_index, inclination_values[track])):
+                if index == 0 and values[0] != values[1] or \
+                        index == self.patch_points - 1 and values[-1] != values[-2]:
+                    on_edge = True
+            if on_edge or patch[best] < self.min_power * self.reference_powers[track]:
+                kept = False
+            peaks.append(find_peaks(patch, inclination_values[track], azimuth_values[track], 1, interpolate=True)[0])
+        peaks = np.stack(peaks)
+
+        # Alpha-beta update. Azimuth residuals are wrapped so tracks can cross 0 and 2 pi
+        residuals = peaks[:, :2] - predictions
+        residuals[:, 1] = np.mod(residuals[:, 1] + np.pi, 2 * np.pi) - np.pi
+        self.positions = np.column_stack(self._limit(*(predictions + self.alpha * residuals).T))
+        self.velocities = self.velocities + self.beta * residuals
+        return peaks, kept
+
+    def process(self, data: np.ndarray) -> np.ndarray:
+        """
+        Find the sources in a block of data
+        :param data: The source data
+        :return: A (num_sources, 3) matrix of (inclination, azimuth, power) rows, strongest first. Positions are the
+            filtered track positions and powers are normalized to the strongest source. Fewer rows are returned if a
+            full scan finds fewer peaks.
+        """
+        prepared = self.estimator.prepare(data)
+
+        peaks, kept = None, False
+        if self.positions is not None and self._blocks % self.full_scan_interval != 0:
+            peaks, kept = self.local_search(prepared)
+        if not kept:
+            peaks = self.full_scan(prepared)
+        self._blocks += 1
+
+        result = np.column_stack([self.positions, peaks[:, 2]])
+        result = result[np.argsort(result[:, 2])[::-1]]
+        result[:, 2] /= np.max(result[:, 2])
+        return result
@@ -0,0 +1,147 @@
+from AccCam.__config__ import __USE_CUPY__
+
+if __USE_CUPY__:
+    import cupy as np
+else:
+    import numpy as np
+
+from AccCam.direction_of_arrival.estimate import Estimator, SpectralEstimator
+from functools import cached_property
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class WidebandEstimator(Estimator):
+    """
+    Wideband direction of arrival over the frequency bins of a short-time Fourier transform, for broadband sources such
+    as speech or machinery which a single wavenumber localizes poorly. Every block is cut into overlapping windowed
+    frames, and the cross-spectral matrix of every bin in frequency_range is averaged over the frames. The bins are then
+    combined either
+    - incoherently: every bin is scanned by the estimator with the steering vectors of its own wavenumber, and the
+      normalized spectra are averaged. The steering matrices of the bins are kept in the wavenumber cache of the
+      structure (see Structure.steering_matrix_at) if all of them fit, and are otherwise computed tile by tile every
+      block. Works with any estimator, but every bin needs enough frames for its own cross-spectral matrix.
+    - coherently: the cross-spectral matrix of every bin is focused onto the wavenumber of the structure with a unitary
+      focusing matrix, and their sum is scanned once like a narrowband covariance. Costs one scan per block, and the
+      bins add up to a full rank matrix even with few frames, at the cost of a focusing error far from the structure's
+      wavenumber.
+    Bins are prepared and scanned bin_batch_size at a time with batched linear algebra.
+    """
+    def __init__(self,
+                 estimator: SpectralEstimator,
+                 frequency_range: tuple[float, float],
+                 fft_size: int = 256,
+                 hop_size: int = None,
+                 combine: str = 'incoherent',
+                 wave_speed: float = 343,
+                 bin_batch_size: int = 16,
+                 focusing_directions: int = 2048):
+        """
+        :param estimator: The estimator to scan every bin (or the focused sum) with. Its num_peaks and region are used,
+            while its covariance estimator and wavenumber are not
+        :param frequency_range: The (min, max) frequencies in Hz of the bins to use. Keep the maximum below the
+            frequency at which the element spacing causes aliasing
+        :param fft_size: The number of samples per frame. Default is 256
+        :param hop_size: The number of samples between the starts of neighbouring frames. Default is fft_size // 2
+        :param combine: 'incoherent' or 'coherent', see above. Default is 'incoherent'
+        :param wave_speed: The speed of the wave in meters per second, to convert frequencies to wavenumbers. Default
+            is 343
+        :param bin_batch_size: The number of bins to prepare and scan at once. Memory use grows with bin_batch_size
+            times the tile size of the estimator. Default is 16
+        :param focusing_directions: For coherent combination, the number of directions of the grid the focusing
+            matrices are fitted over. Default is 2048
+        """
+        if combine not in ('incoherent', 'coherent'):
+            raise ValueError(f"combine must be 'incoherent' or 'coherent', got {combine}")
+        super().__init__(estimator.structure)
+        self.estimator = estimator
+        self.frequency_range = frequency_range
+        self.fft_size = fft_size
+        self.hop_size = hop_size or fft_size // 2
+        self.combine = combine
+        self.wave_speed = wave_speed
+        self.bin_batch_size = bin_batch_size
+        self.focusing_directions = focusing_directions
+
+        frequencies = np.fft.rfftfreq(fft_size, 1 / self.structure.samplerate)
+        self.bins = np.flatnonzero((frequencies >= min(frequency_range)) & (frequencies <= max(frequency_range)) &
+                                   (frequencies > 0))
+        if len(self.bins) == 0:
+            raise ValueError(f'No frequency bin of a {fft_size} point FFT lies in {frequency_range} Hz')
+        self.frequencies = frequencies[self.bins]
+        self.wavenumbers = 2 * np.pi * self.frequencies / wave_speed
+        self.window = np.hanning(fft_size)
+
+        # Bins are visited in the same order every block, so a cache too small for all of them would never hit
+        grid = estimator.grid
+        bin_bytes = grid.num_columns * len(self.structure.elements) * np.dtype(self.structure.complex_dtype).itemsize
+        self.cache_steering = bin_bytes * len(self.bins) <= grid.wavenumber_cache.max_bytes
+        if combine == 'incoherent' and not self.cache_steering:
+            logger.warning(f'The steering matrices of {len(self.bins)} bins take {bin_bytes * len(self.bins)} bytes, '
+                           f'more than the wavenumber cache of {grid.wavenumber_cache.max_bytes} bytes, so they are '
+                           f'computed tile by tile every block. Raise wavenumber_cache_bytes of the structure to keep '
+                           f'them')
+
+    @cached_property
+    def focusing_matrices(self):
+        """
+        :return: A (bins, num_elements, num_elements) stack of unitary matrices T which map the steering vectors of
+            every bin onto the steering vectors of the structure's wavenumber, T @ a(bin) ~ a(structure), in the least
+            squares sense over focusing_directions directions of the grid
+        """
+        inclinations, azimuths = self.estimator.grid.grid_angles
+        directions = np.unique(np.linspace(0, inclinations.size - 1,
+                                           min(self.focusing_directions, inclinations.size)).astype(int))
+        inclinations, azimuths = inclinations[directions], azimuths[directions]
+
+        # Orthogonal Procrustes: with A0 A^H = U S V^H, T = U V^H is the unitary matrix closest to mapping A onto A0
+        reference = self.structure.steering_vectors(inclinations, azimuths)
+        bin_steering = np.stack([self.structure.steering_vectors(inclinations, azimuths, wavenumber)
+                                 for wavenumber in self.wavenumbers])
+        u, _, vh = np.linalg.svd(reference @ np.swapaxes(bin_steering, -1, -2).conj())
+        return u @ vh
+
+    def cross_spectra(self, data: np.ndarray) -> np.ndarray:
+        """
+        :param data: The source data with one sample per row and one element per column
+        :return: A (bins, num_elements, num_elements) stack with the cross-spectral matrix of every bin, averaged over
+            the frames of the block
+        """
+        num_frames = (data.shape[0] - self.fft_size) // self.hop_size + 1
+        if num_frames < 1:
+            raise ValueError(f'Blocks of {data.shape[0]} samples are shorter than the fft_size of {self.fft_size}')
+
+        starts = self.hop_size * np.arange(num_frames)
+        frames = data[starts[:, np.newaxis] + np.arange(self.fft_size)[np.newaxis, :]] * self.window[:, np.newaxis]
+        if np.isrealobj(frames):
+            spectra = np.fft.rfft(frames, axis=1)[:, self.bins]
+        else:
+            spectra = np.fft.fft(frames, axis=1)[:, self.bins]
+
+        # (bins, frames, elements), then the same outer product as calculate_covariance for every bin at once
+        snapshots = np.swapaxes(spectra, 0, 1).astype(self.structure.complex_dtype, copy=False)
+        return np.swapaxes(snapshots, -1, -2) @ snapshots.conj() / num_frames
+
+    def process(self, data: np.ndarray) -> np.ndarray:
+        """
+        :param data: The source data
+        :return: The normalized wideband spectrum with the layout of the estimator's grid, or peaks if the estimator
+            has num_peaks set
+        """
+        cross_spectra = self.cross_spectra(data)
+
+        if self.combine == 'coherent':
+            focusing = self.focusing_matrices
+            focused = np.sum(focusing @ cross_spectra @ np.swapaxes(focusing, -1, -2).conj(), axis=0)
+            return self.estimator.process_covariances(focused)
+
+        total = None
+        for start in range(0, len(self.bins), self.bin_batch_size):
+            end = start + self.bin_batch_size
+            prepared = self.estimator.prepare_covariance(cross_spectra[start:end])
+            spectra = self.estimator.evaluate_bins(prepared, self.wavenumbers[start:end], self.cache_steering)
+            # Normalize every bin so loud bins do not hide the others
+            spectra /= np.max(spectra, axis=-1, keepdims=True)
+            total = np.sum(spectra, axis=0) if total is None else total + np.sum(spectra, axis=0)
+        return self.estimator.finish(total)
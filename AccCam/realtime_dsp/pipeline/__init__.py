@@ -1,3 +1,4 @@
 from .control import *
 from .merge_break import *
 from .import_export import *
+from .results_log import *
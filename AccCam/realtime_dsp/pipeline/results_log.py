@@ -0,0 +1,209 @@
+from AccCam.__config__ import __USE_CUPY__
+import AccCam.direction_of_arrival as doa
+import AccCam.realtime_dsp.pipeline as control
+from datetime import datetime
+import numpy as np
+import logging
+import struct
+import json
+import os
+
+# logging
+logger = logging.getLogger(__name__)
+
+# Every log starts with this magic string, followed by the length of a json header and the header itself
+_MAGIC = b'ACCLOG1\n'
+_HEADER_LENGTH = struct.Struct('<I')
+_SPECTRUM_TYPES = {'none': None, 'float32': '<f4', 'uint8': 'u1'}
+
+
+def _record_dtype(num_peaks: int, spectrum_type: str, spectrum_shape: tuple[int, int]) -> np.dtype:
+    """
+    Builds the fixed size record of a results log
+    :param num_peaks: The number of peaks stored per block
+    :param spectrum_type: The type used to store the spectrum. Can be none, float32, or uint8
+    :param spectrum_shape: The (azimuth, inclination) shape of the stored spectrum
+    :return: A numpy structured dtype
+    """
+    fields = [('timestamp', '<f8'),
+              ('peaks', '<f4', (num_peaks, 3))]
+    if _SPECTRUM_TYPES[spectrum_type] is not None:
+        fields.append(('spectrum', _SPECTRUM_TYPES[spectrum_type], spectrum_shape))
+    return np.dtype(fields)
+
+
+class ResultsToDisk(control.Stage):
+    """
+    Append DOA results to a compact binary log. Each block is stored as one fixed size record holding the timestamp
+    of the message, the strongest peaks of the spectrum, and optionally a downsampled or quantized copy of the
+    spectrum. Use ResultsLog to read the log back. Can also continue pushing data if asked.
+    """
+    def __init__(self,
+                 structure: doa.Structure,
+                 path: str,
+                 num_peaks: int = 4,
+                 spectrum_type: str = 'none',
+                 downsample: int = 1,
+                 port_size=4,
+                 destinations=None):
+        """
+        :param structure: The structure used by the estimator feeding this stage
+        :param path: The file to append to. Created if it does not exist. If it exists, its header must match the
+            settings of this stage.
+        :param num_peaks: The number of peaks to store per block. Missing peaks are stored as nan
+        :param spectrum_type: How to store the spectrum.
+            - none: do not store the spectrum
+            - float32: store the spectrum as 32-bit floats
+            - uint8: quantize the normalized spectrum to 256 levels
+        :param downsample: Keep every n'th angle on both axes of the stored spectrum
+        """
+        super().__init__(1, port_size, destinations)
+        if spectrum_type not in _SPECTRUM_TYPES:
+            raise ValueError(f'spectrum_type must be one of {list(_SPECTRUM_TYPES)}, got {spectrum_type}')
+
+        self.structure = structure
+        self.path = path
+        self.num_peaks = num_peaks
+        self.spectrum_type = spectrum_type
+        self.downsample = downsample
+
+        inclination_values = structure.inclination_values[::downsample]
+        azimuth_values = structure.azimuth_values[::downsample]
+        if __USE_CUPY__:
+            inclination_values, azimuth_values = inclination_values.get(), azimuth_values.get()
+
+        self.header = {
+            'num_peaks': num_peaks,
+            'spectrum_type': spectrum_type,
+            'inclination_values': inclination_values.tolist(),
+            'azimuth_values': azimuth_values.tolist(),
+        }
+        self.dtype = _record_dtype(num_peaks, spectrum_type, (len(azimuth_values), len(inclination_values)))
+        self._write_header()
+
+    def _write_header(self):
+        """
+        Creates the log if needed, otherwise verifies that the existing log is compatible
+        :return: None
+        """
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            existing = ResultsLog(self.path)
+            if existing.header != self.header:
+                raise ValueError(f'Results log {self.path} was written with different settings')
+            return
+
+        header = json.dumps(self.header).encode()
+        with open(self.path, 'wb') as file:
+            file.write(_MAGIC + _HEADER_LENGTH.pack(len(header)) + header)
+
+    def run(self):
+        message = self.port_get()[0]
+        spectrum = message.payload
+
+        peaks = self.structure.peaks(spectrum, self.num_peaks)
+        grid = self.structure.equirectangular(spectrum).reshape(self.structure.grid_shape)
+        grid = grid[::self.downsample, ::self.downsample]
+
+        # Convert to numpy if needed
+        if __USE_CUPY__:
+            peaks, grid = peaks.get(), grid.get()
+
+        record = np.zeros(1, self.dtype)
+        record['timestamp'] = message.timestamp.timestamp()
+        record['peaks'] = np.nan
+        record['peaks'][0, :len(peaks)] = peaks
+        if self.spectrum_type == 'uint8':
+            record['spectrum'] = np.round(np.clip(grid, 0, 1) * 255)
+        elif self.spectrum_type == 'float32':
+            record['spectrum'] = grid
+
+        with open(self.path, 'ab') as file:
+            file.write(record.tobytes())
+
+        self.port_put(message)
+
+
+class ResultsLog:
+    """
+    Reads a log written by ResultsToDisk. Records are memory-mapped, so opening a log is instant regardless of its size,
+    and queries only touch the records they return.
+    """
+    def __init__(self, path: str):
+        """
+        :param path: The path of the log
+        """
+        self.path = path
+
+        with open(path, 'rb') as file:
+            if file.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f'{path} is not a results log')
+            length, = _HEADER_LENGTH.unpack(file.read(_HEADER_LENGTH.size))
+            self.header = json.loads(file.read(length))
+
+        self.inclination_values = np.array(self.header['inclination_values'])
+        self.azimuth_values = np.array(self.header['azimuth_values'])
+        self.dtype = _record_dtype(self.header['num_peaks'],
+                                   self.header['spectrum_type'],
+                                   (len(self.azimuth_values), len(self.inclination_values)))
+
+        # Ignore a partially written record at the end of the file
+        offset = len(_MAGIC) + _HEADER_LENGTH.size + length
+        count = (os.path.getsize(path) - offset) // self.dtype.itemsize
+        if count > 0:
+            self.records = np.memmap(path, self.dtype, mode='r', offset=offset, shape=(count,))
+        else:
+            self.records = np.zeros(0, self.dtype)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """
+        :return: The timestamps of all records as POSIX seconds
+        """
+        return self.records['timestamp']
+
+    def select(self, start: datetime = None, end: datetime = None) -> slice:
+        """
+        Find the records between two times. Records are appended in order, so this is a binary search.
+        :param start: The earliest time to include. If not provided, start at the first record
+        :param end: The latest time to include. If not provided, end at the last record
+        :return: A slice into the records
+        """
+        first = 0 if start is None else np.searchsorted(self.timestamps, start.timestamp(), 'left')
+        last = len(self) if end is None else np.searchsorted(self.timestamps, end.timestamp(), 'right')
+        return slice(int(first), int(last))
+
+    def times(self, start: datetime = None, end: datetime = None) -> list[datetime]:
+        """
+        :return: The timestamps of the records between start and end as datetimes
+        """
+        return [datetime.fromtimestamp(t) for t in self.timestamps[self.select(start, end)]]
+
+    def peaks(self, start: datetime = None, end: datetime = None) -> np.ndarray:
+        """
+        :return: A (records, num_peaks, 3) matrix of (inclination, azimuth, power) between start and end. Missing
+            peaks are nan.
+        """
+        return np.array(self.records['peaks'][self.select(start, end)])
+
+    def spectra(self, start: datetime = None, end: datetime = None) -> np.ndarray:
+        """
+        :return: A (records, azimuths, inclinations) matrix of the stored spectra between start and end, scaled back to
+            the range 0 to 1 if quantized
+        """
+        if 'spectrum' not in self.dtype.names:
+            raise ValueError(f'Results log {self.path} does not store spectra')
+
+        spectra = np.array(self.records['spectrum'][self.select(start, end)], dtype=np.float32)
+        if self.header['spectrum_type'] == 'uint8':
+            spectra /= 255
+        return spectra
+
+    def latest(self, count: int = 1) -> np.ndarray:
+        """
+        :param count: The number of records to return
+        :return: The last records of the log
+        """
+        return np.array(self.records[max(len(self) - count, 0):])
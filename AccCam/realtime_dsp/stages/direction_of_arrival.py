@@ -1,3 +1,10 @@
+from AccCam.__config__ import __USE_CUPY__
+
+if __USE_CUPY__:
+    import cupy as np
+else:
+    import numpy as np
+
 import AccCam.direction_of_arrival as doa
 import AccCam.realtime_dsp.pipeline as pipe
 
@@ -19,3 +26,71 @@ class DOAEstimator(pipe.Stage):
         data = message.payload
         direction = self.estimator.process(data)
         self.port_put(pipe.Message(direction))
+
+
+class PeakPicker(pipe.Stage):
+    """
+    Reduce a spectrum from an estimator to a short list of its strongest peaks. Pushes a (num_peaks, 3) float32 matrix
+    of (inclination, azimuth, power) rows, which is much cheaper to pass between processes or save than the spectrum.
+    """
+
+    def __init__(self, structure: doa.Structure, num_peaks: int, interpolate: bool = True, port_size=4,
+                 destinations=None):
+        """
+        :param structure: The structure used by the estimator before this stage
+        :param num_peaks: The maximum number of peaks to push
+        :param interpolate: If true, refine peaks between grid points with parabolic interpolation
+        """
+        super().__init__(1, port_size, destinations)
+        self.structure = structure
+        self.num_peaks = num_peaks
+        self.interpolate = interpolate
+
+    def run(self):
+        message = self.port_get()[0]
+        peaks = self.structure.peaks(message.payload, self.num_peaks, self.interpolate)
+        self.port_put(pipe.Message(peaks.astype('float32')))
+
+
+class EstimatorBank(pipe.Stage):
+    """
+    Run several spectral estimators on the same blocks in one stage, for example to compare them. The covariance matrix,
+    and its eigendecomposition if any estimator needs it, are computed once per block and shared by every estimator.
+    Pushes one message holding a list with the output of every estimator, in the order given.
+    """
+
+    def __init__(self, estimators: list[doa.SpectralEstimator], covariance: doa.CovarianceEstimator = None,
+                 port_size=4, destinations=None):
+        """
+        :param estimators: The estimators to run. Their own covariance estimators are not used, and
+            SubspaceTrackingMusic takes its subspace from the shared eigendecomposition rather than tracking it
+        :param covariance: If provided, estimate the shared covariance across blocks with it rather than from the
+            current block only
+        """
+        super().__init__(1, port_size, destinations)
+        self.estimators = estimators
+        self.covariance = covariance
+        self.uses_decomposition = any(estimator.uses_decomposition for estimator in estimators)
+
+    def run(self):
+        message = self.port_get()[0]
+        data = message.payload
+
+        if self.covariance is not None:
+            cov_matrix = self.covariance.update(data)
+        else:
+            cov_matrix = doa.calculate_covariance(data)
+        eigvals, eigvecs = np.linalg.eigh(cov_matrix) if self.uses_decomposition else (None, None)
+
+        results = []
+        for estimator in self.estimators:
+            complex_dtype = estimator.structure.complex_dtype
+            if eigvecs is None:
+                prepared = estimator.prepare_covariance(cov_matrix.astype(complex_dtype, copy=False))
+            else:
+                prepared = estimator.prepare_decomposition(cov_matrix.astype(complex_dtype, copy=False),
+                                                           eigvals.astype(estimator.structure.real_dtype, copy=False),
+                                                           eigvecs.astype(complex_dtype, copy=False))
+            results.append(estimator.process_prepared(prepared))
+
+        self.port_put(pipe.Message(results, names=[type(estimator).__name__ for estimator in self.estimators]))
@@ -314,7 +314,8 @@ class HeatmapPlotter(Plotter):
 class HeatmapPlotterVideo(Plotter):
     """
     A HeatmapPlotter with a video feed displayed behind the heatmap. The spacing of angles of the Estimator must be
-    linear for this plotter, unlike HeatmapPlotter.
+    linear for this plotter, unlike HeatmapPlotter. Give the estimator a Region from the camera (Region.from_camera) so
+    only the directions in view are scanned.
     """
 
     def __init__(self,
@@ -328,7 +329,11 @@ class HeatmapPlotterVideo(Plotter):
                  interval: float,
                  cmap=cv.COLORMAP_JET,
                  port_size=4,
-                 destinations=None):
+                 destinations=None,
+                 region: doa.Region = None):
+        """
+        :param region: The region scanned by the estimator, if any. Default is the whole grid of the structure
+        """
         super().__init__(interval=interval, port_size=port_size, destinations=destinations)
 
         self.fig, self.ax = plt.subplots()
@@ -349,22 +354,26 @@ class HeatmapPlotterVideo(Plotter):
 
         # Audio
         self.structure = structure
+        self.region = region
 
     def _on_frame_update(self, frame):
         # Audio get
         message = self.port_get()[0]
-        payload = message.payload
+        grid = self.region if self.region is not None else self.structure
+        payload = grid.equirectangular(message.payload)
 
         if __USE_CUPY__:
             payload = payload.get()
 
         payload_uint8 = np.uint8(payload * 255)
 
-        raw_audio = payload_uint8.reshape(self.structure.inclination_resolution, self.structure.azimuth_resolution)
-        audio = cv.applyColorMap(raw_audio, self.cmap)
+        # One row per inclination and one column per azimuth, stretched over the frame
+        raw_audio = payload_uint8.reshape(grid.grid_shape).T
 
         # Image get
         image = self.camera.read()
+        raw_audio = cv.resize(raw_audio, (image.shape[1], image.shape[0]))
+        audio = cv.applyColorMap(raw_audio, self.cmap)
 
         # Superimpose
         superimpose = cv.addWeighted(image, 0.5, audio, 0.5, 0)
@@ -0,0 +1,41 @@
+from AccCam.__config__ import __USE_CUPY__
+
+if __USE_CUPY__:
+    import cupy as np
+else:
+    import numpy as np
+
+import AccCam.direction_of_arrival as doa
+import time
+
+
+def time_estimator(estimator, blocks):
+    """
+    Time the process of an estimator over blocks
+    :param estimator: The estimator to time
+    :param blocks: The blocks of source data to process
+    :return: The average time per block in seconds, and the output of every block
+    """
+    # Warm up so the steering matrix, its factorization, and any lazy setup are not timed
+    estimator.process(blocks[0])
+
+    start = time.perf_counter()
+    outputs = [estimator.process(block) for block in blocks]
+    if __USE_CUPY__:
+        np.cuda.Device().synchronize()
+    return (time.perf_counter() - start) / len(blocks), outputs
+
+
+def peak_error(reference_peaks, peaks) -> float:
+    """
+    :param reference_peaks: The (num_peaks, 3) peaks of every block to compare against
+    :param peaks: The (num_peaks, 3) peaks of every block to compare
+    :return: The largest angle in degrees between a reference peak and the nearest compared peak, on the unit sphere
+    """
+    errors = []
+    for reference, found in zip(reference_peaks, peaks):
+        reference_directions = doa.spherical_to_cartesian(np.column_stack([np.ones(len(reference)), reference[:, :2]]))
+        found_directions = doa.spherical_to_cartesian(np.column_stack([np.ones(len(found)), found[:, :2]]))
+        cosines = np.clip(reference_directions.reshape(-1, 3) @ found_directions.reshape(-1, 3).T, -1, 1)
+        errors.append(np.max(np.min(np.arccos(cosines), axis=1)))
+    return float(np.degrees(np.max(np.array(errors))))
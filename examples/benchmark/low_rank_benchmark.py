@@ -0,0 +1,66 @@
+from AccCam.__config__ import __USE_CUPY__
+
+if __USE_CUPY__:
+    import cupy as np
+else:
+    import numpy as np
+
+import AccCam.direction_of_arrival as doa
+from benchmark_utility import time_estimator, peak_error
+
+
+def main():
+
+    # Variables
+    samplerate = 44100
+    blocksize = 4096
+    wavenumber = 12.3
+    num_blocks = 10
+    num_peaks = 2
+    tolerances = (1e-2, 1e-3, 1e-4)
+
+    # Compact 5 x 5 grid, about a third of a wavelength across, for which the steering matrix is far from full rank
+    spacing = 0.04
+    elements = [doa.Element(np.array([x * spacing, y * spacing, 0]), samplerate) for x in range(5) for y in range(5)]
+
+    def make_structure(tolerance):
+        return doa.Structure(elements=elements,
+                             wavenumber=wavenumber,
+                             snr=50,
+                             blocksize=blocksize,
+                             inclination_range=(0, np.pi / 2),
+                             steering_rank_tolerance=tolerance)
+
+    reference = make_structure(None)
+    structures = {tolerance: make_structure(tolerance) for tolerance in tolerances}
+
+    wavevectors = [
+        doa.WaveVector(doa.spherical_to_cartesian(np.array([wavenumber, 0.4, 1]))),
+        doa.WaveVector(doa.spherical_to_cartesian(np.array([wavenumber, 1.2, 4]))),
+    ]
+    blocks = [reference.simulate_audio(wavevectors) for _ in range(num_blocks)]
+
+    for tolerance, structure in structures.items():
+        basis, coefficients = structure.steering_factors
+        print(f'tolerance {tolerance:g}: rank {basis.shape[1]} of {len(elements)}, '
+              f'{coefficients.nbytes / 1024 ** 2:.1f} MiB of coefficients for a '
+              f'{reference.steering_matrix.nbytes / 1024 ** 2:.1f} MiB steering matrix')
+    print()
+
+    estimators = {
+        'DelaySumBeamformer': lambda structure: doa.DelaySumBeamformer(structure, num_peaks=num_peaks),
+        'BartlettBeamformer': lambda structure: doa.BartlettBeamformer(structure, num_peaks=num_peaks),
+        'Music': lambda structure: doa.Music(structure, len(wavevectors), num_peaks=num_peaks),
+    }
+
+    print(f'{"estimator":<20}{"tolerance":>10}{"full ms":>10}{"low-rank ms":>13}{"speedup":>10}{"max error deg":>16}')
+    for name, make_estimator in estimators.items():
+        full_time, full_peaks = time_estimator(make_estimator(reference), blocks)
+        for tolerance, structure in structures.items():
+            low_rank_time, low_rank_peaks = time_estimator(make_estimator(structure), blocks)
+            print(f'{name:<20}{tolerance:>10g}{full_time * 1e3:>10.2f}{low_rank_time * 1e3:>13.2f}'
+                  f'{full_time / low_rank_time:>10.2f}{peak_error(full_peaks, low_rank_peaks):>16.4f}')
+
+
+if __name__ == '__main__':
+    main()
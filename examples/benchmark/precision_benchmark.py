@@ -0,0 +1,63 @@
+from AccCam.__config__ import __USE_CUPY__
+
+if __USE_CUPY__:
+    import cupy as np
+else:
+    import numpy as np
+
+import AccCam.direction_of_arrival as doa
+from benchmark_utility import time_estimator, peak_error
+
+
+def main():
+
+    # Variables
+    samplerate = 44100
+    blocksize = 4096
+    wavenumber = 12.3
+    num_blocks = 10
+    num_peaks = 2
+
+    # Cross of 12 elements
+    offsets = [-1.25, -0.75, -0.25, 0.25, 0.75, 1.25]
+    elements = ([doa.Element(np.array([offset, 0, 0]), samplerate) for offset in offsets] +
+                [doa.Element(np.array([0, offset, 0]), samplerate) for offset in offsets])
+
+    structures = {precision: doa.Structure(elements=elements,
+                                           wavenumber=wavenumber,
+                                           snr=50,
+                                           blocksize=blocksize,
+                                           inclination_range=(0, np.pi / 2),
+                                           precision=precision)
+                  for precision in ('double', 'single')}
+
+    wavevectors = [
+        doa.WaveVector(doa.spherical_to_cartesian(np.array([wavenumber * 0.98, 0.6, 1]))),
+        doa.WaveVector(doa.spherical_to_cartesian(np.array([wavenumber * 1.02, 1.2, 4]))),
+    ]
+    blocks = [structures['double'].simulate_audio(wavevectors) for _ in range(num_blocks)]
+
+    for precision, structure in structures.items():
+        print(f'{precision} steering matrix: {structure.steering_matrix.nbytes / 1024 ** 2:.1f} MiB')
+    print()
+
+    estimators = {
+        'DelaySumBeamformer': lambda structure: doa.DelaySumBeamformer(structure, num_peaks=num_peaks),
+        'BartlettBeamformer': lambda structure: doa.BartlettBeamformer(structure, num_peaks=num_peaks),
+        'MVDRBeamformer': lambda structure: doa.MVDRBeamformer(structure, num_peaks=num_peaks),
+        'Music': lambda structure: doa.Music(structure, len(wavevectors), num_peaks=num_peaks),
+    }
+
+    print(f'{"estimator":<20}{"double ms":>12}{"single ms":>12}{"speedup":>10}{"max error deg":>16}')
+    for name, make_estimator in estimators.items():
+        double_time, double_peaks = time_estimator(make_estimator(structures['double']), blocks)
+        single_time, single_peaks = time_estimator(make_estimator(structures['single']), blocks)
+
+        max_error = peak_error(double_peaks, single_peaks)
+
+        print(f'{name:<20}{double_time * 1e3:>12.2f}{single_time * 1e3:>12.2f}{double_time / single_time:>10.2f}'
+              f'{max_error:>16.4f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+import AccCam.direction_of_arrival as doa
+
+
+def make_structure(cache=None, wavenumber=12.3):
+    rng = np.random.default_rng(0)
+    elements = [doa.Element(position, 44100) for position in rng.random((6, 3)) * 0.4]
+    return doa.Structure(elements, wavenumber, 50, 2048, inclination_resolution=20, azimuth_resolution=41, cache=cache)
+
+
+def test_steering_cache_hit_returns_the_same_matrix(tmp_path):
+    cache = doa.SteeringCache(str(tmp_path))
+    computed = make_structure(cache).steering_matrix
+    assert os.path.exists(tmp_path / f'{make_structure().geometry_hash}.npy')
+
+    loaded = make_structure(cache).steering_matrix
+    assert isinstance(cache.load(make_structure().geometry_hash), np.memmap)
+    assert np.array_equal(loaded, computed)
+    assert np.array_equal(loaded, make_structure().steering_matrix)
+
+
+def test_steering_cache_evicts_the_least_recently_used(tmp_path):
+    matrix = np.zeros(1000)
+    np.save(tmp_path / 'size.npy', matrix)
+    path = tmp_path / 'cache'
+    cache = doa.SteeringCache(str(path), max_bytes=2 * os.path.getsize(tmp_path / 'size.npy'))
+
+    cache.save('first', matrix)
+    cache.save('second', matrix)
+    os.utime(path / 'first.npy', (1000, 1000))
+    os.utime(path / 'second.npy', (2000, 2000))
+
+    # Loading marks first as recently used, so second is the oldest when a third matrix does not fit
+    assert cache.load('first') is not None
+    cache.save('third', matrix)
+    assert sorted(os.listdir(path)) == ['first.npy', 'third.npy']
+    assert cache.load('second') is None
+
+
+def test_memory_cache_evicts_the_least_recently_used():
+    matrices = {key: np.full(100, value, dtype=float) for value, key in enumerate('abc')}
+    cache = doa.MemoryCache(2 * matrices['a'].nbytes)
+    cache.get('a', lambda: matrices['a'])
+    cache.get('b', lambda: matrices['b'])
+    assert cache.get('a', lambda: pytest.fail('a should be cached')) is matrices['a']
+
+    # b is the oldest once a was used again
+    cache.get('c', lambda: matrices['c'])
+    assert cache.cache_info() == (1, 3, 2 * matrices['a'].nbytes, 2 * matrices['a'].nbytes, 2)
+    cache.get('b', lambda: matrices['b'])
+    assert cache.cache_info().misses == 4
+
+    # Copies sent to other processes start empty
+    assert pickle.loads(pickle.dumps(cache)).cache_info() == (0, 0, cache.max_bytes, 0, 0)
+
+
+@pytest.fixture
+def shared():
+    structures = [make_structure(), make_structure(wavenumber=20)]
+    for structure in structures:
+        structure.share()
+    yield structures
+    for structure in structures:
+        structure.unshare()
+
+
+def test_shared_steering_matrix_is_not_pickled(shared):
+    structure = shared[0]
+    assert 'steering_matrix' not in structure.__getstate__()
+
+    payload = pickle.dumps(structure)
+    assert len(payload) < structure.steering_matrix.nbytes
+    copy = pickle.loads(payload)
+    assert np.array_equal(copy.steering_matrix, structure.steering_matrix)
+    assert not copy.steering_matrix.flags.writeable
+
+
+def test_shared_matrices_get_different_names(shared):
+    first, second = shared
+    assert first.shared_name != second.shared_name
+    assert not np.array_equal(first.steering_matrix, second.steering_matrix)
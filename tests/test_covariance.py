@@ -0,0 +1,40 @@
+import numpy as np
+
+import AccCam.direction_of_arrival as doa
+
+
+def test_calculate_covariance_matches_numpy():
+    data = np.random.default_rng(0).standard_normal((3, 50, 4))
+    stacked = doa.calculate_covariance(data)
+    for block, covariance in zip(data, stacked):
+        assert np.allclose(covariance, np.cov(block.T))
+
+
+class Recorder(doa.CovarianceEstimator):
+    def __init__(self):
+        self.blocks = []
+
+    def update(self, data):
+        self.blocks.append(data)
+        return doa.calculate_covariance(data)
+
+
+def test_decimated_covariance_keeps_the_stride_across_blocks():
+    data = np.random.default_rng(1).standard_normal((64, 4))
+    recorder = Recorder()
+    decimated = doa.DecimatedCovariance(3, recorder)
+    for start in range(0, 64, 8):
+        decimated.update(data[start:start + 8])
+    assert np.array_equal(np.concatenate(recorder.blocks), data[::3])
+
+
+def test_decimated_covariance_skips_blocks_without_a_kept_snapshot():
+    data = np.random.default_rng(2).standard_normal((10, 4))
+    decimated = doa.DecimatedCovariance(8)
+    first = decimated.update(data[:9])
+
+    # The next kept snapshot is 7 samples ahead, beyond a 2 sample block
+    second = decimated.update(data[9:])
+    assert np.all(np.isfinite(second))
+    assert np.allclose(second, first)
+    assert decimated.update(np.random.default_rng(3).standard_normal((16, 4))).shape == (4, 4)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+import AccCam.direction_of_arrival as doa
+
+
+def make_structure(positions, wavenumber=12.3):
+    elements = [doa.Element(np.array(position, dtype=float), 44100) for position in positions]
+    return doa.Structure(elements, wavenumber, 50, 2048, inclination_range=(0, np.pi / 2),
+                         inclination_resolution=60, azimuth_resolution=120)
+
+
+def simulate(structure, directions):
+    np.random.seed(0)
+    wavevectors = [doa.WaveVector(doa.spherical_to_cartesian(np.array([structure.wavenumber, *direction])))
+                   for direction in directions]
+    return structure.simulate_audio(wavevectors)
+
+
+@pytest.mark.parametrize('positions', [
+    [(x * 0.2, y * 0.2, 0) for x in range(4) for y in range(4)],
+    [(x * 0.2, 0, 0) for x in (0, 1, 2, 4, 5, 7)],
+], ids=['planar', 'linear with gaps'])
+def test_fft_beamformer_matches_bartlett(positions):
+    structure = make_structure(positions)
+    data = simulate(structure, [(0.7, 1.0), (1.2, 4.0)])
+
+    fft_spectrum = doa.FFTBeamformer(structure).process(data)
+    bartlett_spectrum = doa.BartlettBeamformer(structure).process(data)
+    assert fft_spectrum.shape == bartlett_spectrum.shape
+    assert np.max(np.abs(fft_spectrum - bartlett_spectrum)) < 1e-3
+
+
+def test_fft_beamformer_batches_like_bartlett():
+    structure = make_structure([(x * 0.2, y * 0.2, 0) for x in range(4) for y in range(4)])
+    blocks = np.stack([simulate(structure, [(0.7, 1.0)]), simulate(structure, [(1.2, 4.0)])])
+
+    fft_peaks = doa.FFTBeamformer(structure, num_peaks=1).process(blocks)
+    bartlett_peaks = doa.BartlettBeamformer(structure, num_peaks=1).process(blocks)
+    assert fft_peaks.shape == (2, 1, 3)
+    assert np.allclose(fft_peaks[..., :2], bartlett_peaks[..., :2], atol=0.02)
+
+
+def test_fft_beamformer_rejects_structures_off_a_lattice():
+    np.random.seed(1)
+    with pytest.raises(ValueError):
+        doa.FFTBeamformer(make_structure(np.random.rand(6, 3)))
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+import AccCam.direction_of_arrival as doa
+
+SAMPLERATE = 16000
+WAVENUMBER = 2 * np.pi * 2000 / 343
+SPACING = 0.04
+
+
+def make_structure(positions):
+    elements = [doa.Element(np.array(position, dtype=float), SAMPLERATE) for position in positions]
+    return doa.Structure(elements, WAVENUMBER, 40, 2048, inclination_resolution=10, azimuth_resolution=10)
+
+
+def analytic_audio(structure, directions, seed=0):
+    # Complex tones of unrelated phases, so the sources are not mirrored and stay uncorrelated
+    rng = np.random.default_rng(seed)
+    time_vector = np.arange(structure.blocksize) / SAMPLERATE
+    frequencies = 2 * np.pi * (2000 + 37 * np.arange(len(directions)))
+    phases = rng.uniform(-np.pi, np.pi, (len(directions), 1))
+    waveforms = np.exp(1j * (frequencies[:, np.newaxis] * time_vector + phases))
+    wavevectors = [doa.WaveVector(doa.spherical_to_cartesian(np.array([WAVENUMBER, *direction])))
+                   for direction in directions]
+    noise = rng.standard_normal((structure.blocksize, len(structure.elements), 2)) @ np.array([1, 1j]) * 0.01
+    return waveforms.T @ structure.steering_vector(wavevectors) + noise
+
+
+@pytest.fixture
+def linear():
+    return make_structure([(SPACING * i, 0, 0) for i in range(8)])
+
+
+@pytest.fixture
+def rectangular():
+    return make_structure([(SPACING * i, SPACING * j, 0) for i in range(4) for j in range(4)])
+
+
+def test_lattice_of_a_linear_array(linear):
+    lattice = linear.lattice
+    assert lattice.rank == 1 and lattice.shape == (8,) and lattice.is_complete
+    assert np.allclose(lattice.basis[0], (SPACING, 0, 0))
+    assert linear.is_uniform_linear and not linear.is_uniform_rectangular
+
+
+def test_lattice_of_a_rectangular_array(rectangular):
+    lattice = rectangular.lattice
+    assert lattice.rank == 2 and lattice.shape == (4, 4) and lattice.is_complete
+    assert rectangular.is_uniform_rectangular and not rectangular.is_uniform_linear
+
+
+def test_lattice_with_a_gap():
+    structure = make_structure([(SPACING * i, 0, 0) for i in (0, 1, 2, 4, 5)])
+    assert structure.lattice.shape == (6,) and not structure.lattice.is_complete
+    assert not structure.is_uniform_linear
+
+
+def test_non_lattice_structures_are_rejected():
+    structure = make_structure([(0, 0, 0), (0.04, 0, 0), (0.1, 0, 0), (0.03, 0.07, 0)])
+    assert structure.lattice is None
+    with pytest.raises(ValueError):
+        doa.RootMusic(structure, 1)
+    with pytest.raises(ValueError):
+        doa.Esprit(structure, 1)
+
+
+@pytest.mark.parametrize('estimator', [doa.RootMusic, doa.Esprit])
+def test_linear_angles(linear, estimator):
+    # Angles to the array axis, which lies along x
+    angles = np.array([1.0, 2.0])
+    audio = analytic_audio(linear, [(np.pi / 2, angle) for angle in angles])
+    estimated = np.sort(np.asarray(estimator(linear, 2).process(audio)))
+    assert np.allclose(estimated, angles, atol=0.02)
+
+
+def test_rectangular_directions(rectangular):
+    directions = np.array([(0.5, 1.0), (0.9, 4.0)])
+    audio = analytic_audio(rectangular, directions)
+    estimated = doa.Esprit(rectangular, 2).process(audio)
+    estimated = estimated[np.argsort(estimated[:, 1])]
+    assert np.allclose(estimated, directions, atol=0.03)
@@ -0,0 +1,53 @@
+import numpy as np
+
+from AccCam.direction_of_arrival.peaks import find_peaks
+
+
+def gaussian_spectrum(inclination_values, azimuth_values, sources):
+    """
+    :return: A flattened, azimuth-major spectrum with a gaussian bump at every (inclination, azimuth) source, measured
+        by the angle between directions so it is continuous across the azimuth seam and the poles
+    """
+    inclinations, azimuths = np.meshgrid(inclination_values, azimuth_values)
+    directions = np.stack([np.sin(inclinations) * np.cos(azimuths), np.sin(inclinations) * np.sin(azimuths),
+                           np.cos(inclinations)], axis=-1)
+    spectrum = np.zeros(inclinations.shape)
+    for power, (inclination, azimuth) in sources:
+        source = np.array([np.sin(inclination) * np.cos(azimuth), np.sin(inclination) * np.sin(azimuth),
+                           np.cos(inclination)])
+        angles = np.arccos(np.clip(directions @ source, -1, 1))
+        spectrum += power * np.exp(-angles ** 2 / 0.05)
+    return spectrum.ravel()
+
+
+def test_source_on_the_azimuth_seam_is_found_once():
+    inclination_values = np.linspace(0, np.pi, 50)
+    azimuth_values = np.linspace(0, 2 * np.pi, 90)
+    spectrum = gaussian_spectrum(inclination_values, azimuth_values, [(1, (1.0, 0.02)), (0.5, (2.0, 3.0))])
+
+    for interpolate in (False, True):
+        peaks = find_peaks(spectrum, inclination_values, azimuth_values, 3, interpolate)
+        assert len(peaks) == 2
+        assert np.allclose(peaks[:, :2], [[1.0, 0.02], [2.0, 3.0]], atol=0.05)
+        assert np.all((peaks[:, 1] >= 0) & (peaks[:, 1] < 2 * np.pi))
+
+
+def test_source_on_a_pole_is_found_once():
+    inclination_values = np.linspace(0, np.pi, 50)
+    azimuth_values = np.linspace(0, 2 * np.pi, 90)
+    spectrum = gaussian_spectrum(inclination_values, azimuth_values, [(1, (0, 0)), (0.5, (np.pi, 0))])
+
+    for interpolate in (False, True):
+        peaks = find_peaks(spectrum, inclination_values, azimuth_values, 3, interpolate)
+        assert len(peaks) == 2
+        assert np.allclose(peaks[:, 0], [0, np.pi])
+
+
+def test_partial_azimuth_range_does_not_wrap():
+    inclination_values = np.linspace(0.5, 2.5, 30)
+    azimuth_values = np.linspace(0, np.pi, 40)
+    spectrum = gaussian_spectrum(inclination_values, azimuth_values, [(1, (1.5, 0)), (1, (1.5, np.pi))])
+
+    peaks = find_peaks(spectrum, inclination_values, azimuth_values, 3)
+    assert len(peaks) == 2
+    assert np.allclose(np.sort(peaks[:, 1]), [0, np.pi])
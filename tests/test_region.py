@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+import AccCam.direction_of_arrival as doa
+
+
+@pytest.fixture
+def structure():
+    np.random.seed(0)
+    elements = [doa.Element(np.array(position), 44100) for position in np.random.rand(6, 3) * 0.4]
+    return doa.Structure(elements, 12.3, 50, 2048, inclination_resolution=40, azimuth_resolution=121)
+
+
+@pytest.mark.parametrize('window', [(5.9, 0.4), (-0.4, 0.4)])
+def test_azimuth_window_wraps_across_the_seam(structure, window):
+    region = doa.Region(structure, azimuth_window=window)
+
+    # Every azimuth within 0.4 of azimuth 0 on either side, each direction once, walking across 0 / 2 pi
+    distances = np.abs(np.mod(structure.azimuth_values + np.pi, 2 * np.pi) - np.pi)
+    expected = np.count_nonzero(distances <= 0.4 + 1e-9) - 1
+    assert len(region.azimuth_values) == expected
+    assert np.all(np.abs(np.mod(region.azimuth_values + np.pi, 2 * np.pi) - np.pi) <= 0.4 + 1e-9)
+    assert np.all(np.diff(np.unwrap(region.azimuth_values)) > 0)
+
+    # Scans the same directions as the structure
+    assert np.allclose(region.steering_matrix, structure.steering_matrix[:, region.columns])
+
+
+def test_azimuth_window_inside_the_range_does_not_wrap(structure):
+    region = doa.Region(structure, azimuth_window=(1, 2))
+    assert np.all((region.azimuth_values >= 1) & (region.azimuth_values <= 2))
+    assert np.all(np.diff(region.azimuth_values) > 0)
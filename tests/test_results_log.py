@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+import AccCam.direction_of_arrival as doa
+
+# The pipeline imports sounddevice, which needs the PortAudio library
+try:
+    import AccCam.realtime_dsp as dsp
+except OSError as error:
+    pytest.skip(f'AccCam.realtime_dsp cannot be imported: {error}', allow_module_level=True)
+
+
+@pytest.fixture
+def structure():
+    np.random.seed(0)
+    elements = [doa.Element(np.array(position), 44100) for position in np.random.rand(6, 3) * 0.4]
+    return doa.Structure(elements, 12.3, 50, 2048, inclination_resolution=20, azimuth_resolution=41)
+
+
+def write_frames(stage, spectra):
+    messages = []
+    for spectrum in spectra:
+        message = dsp.Message(spectrum)
+        messages.append(message)
+        stage.input_queue[0].put(message)
+        stage.run()
+    return messages
+
+
+@pytest.mark.parametrize('spectrum_type, dtype', [('none', None), ('float32', np.float32), ('uint8', np.uint8)])
+def test_round_trip(structure, tmp_path, spectrum_type, dtype):
+    path = str(tmp_path / 'results.log')
+    spectra = [doa.BartlettBeamformer(structure).process(structure.simulate_audio(
+        [doa.WaveVector(doa.spherical_to_cartesian(np.array([12.3, 1.0, azimuth])))])) for azimuth in (1, 2, 3)]
+    stage = dsp.ResultsToDisk(structure, path, num_peaks=3, spectrum_type=spectrum_type, downsample=2)
+    messages = write_frames(stage, spectra)
+
+    log = dsp.ResultsLog(path)
+    assert log.header == stage.header
+    assert log.header['num_peaks'] == 3 and log.header['spectrum_type'] == spectrum_type
+    assert np.allclose(log.inclination_values, structure.inclination_values[::2])
+    assert np.allclose(log.azimuth_values, structure.azimuth_values[::2])
+
+    assert len(log) == len(spectra)
+    assert np.allclose(log.timestamps, [message.timestamp.timestamp() for message in messages])
+    peaks = log.peaks()
+    assert peaks.shape == (len(spectra), 3, 3) and peaks.dtype == np.float32
+    for stored, spectrum in zip(peaks, spectra):
+        expected = structure.peaks(spectrum, 3)
+        assert np.allclose(stored[:len(expected)], expected, atol=1e-6)
+        assert np.all(np.isnan(stored[len(expected):]))
+
+    shape = (len(log.azimuth_values), len(log.inclination_values))
+    if dtype is None:
+        with pytest.raises(ValueError):
+            log.spectra()
+        return
+    assert log.records['spectrum'].shape == (len(spectra), *shape)
+    assert log.records['spectrum'].dtype == dtype
+    for stored, spectrum in zip(log.spectra(), spectra):
+        expected = structure.equirectangular(spectrum).reshape(structure.grid_shape)[::2, ::2]
+        assert np.allclose(stored, expected, atol=1 / 255 if dtype == np.uint8 else 1e-6)
+
+
+def test_reopening_appends(structure, tmp_path):
+    path = str(tmp_path / 'results.log')
+    spectrum = np.random.rand(structure.steering_matrix.shape[1])
+    write_frames(dsp.ResultsToDisk(structure, path), [spectrum])
+    write_frames(dsp.ResultsToDisk(structure, path), [spectrum])
+    assert len(dsp.ResultsLog(path)) == 2
+
+    with pytest.raises(ValueError):
+        dsp.ResultsToDisk(structure, path, num_peaks=2)
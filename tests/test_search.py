@@ -0,0 +1,19 @@
+import numpy as np
+
+import AccCam.direction_of_arrival as doa
+
+
+def test_tracking_stays_within_the_region():
+    np.random.seed(0)
+    elements = [doa.Element(np.array(position), 16000) for position in np.random.rand(8, 3) * 0.1]
+    wavenumber = 2 * np.pi * 2000 / 343
+    structure = doa.Structure(elements, wavenumber, 30, 1024, inclination_resolution=30, azimuth_resolution=60)
+    region = doa.Region(structure, inclination_window=(1.2, 1.8), azimuth_window=(5.8, 0.5))
+    search = doa.TrackingSearch(doa.Music(structure, 1, region=region), 1)
+
+    # The source drifts across the seam and out of the region, below its inclinations
+    for azimuth in (6.0, 6.2, 0.1, 0.3, 0.6, 0.9):
+        source = doa.WaveVector(doa.spherical_to_cartesian(np.array([wavenumber, 1.0, azimuth])))
+        inclination, azimuth, _ = search.process(structure.simulate_audio([source]))[0]
+        assert 1.2 - 1e-9 <= inclination <= 1.8 + 1e-9
+        assert np.mod(azimuth - 5.8, 2 * np.pi) <= np.mod(0.5 - 5.8, 2 * np.pi) + 1e-9
@@ -0,0 +1,42 @@
+import numpy as np
+
+import AccCam.direction_of_arrival as doa
+
+WAVENUMBER = 2 * np.pi * 2000 / 343
+
+
+def analytic_audio(structure, directions, rng):
+    # Complex tones of unrelated frequencies and phases, so the sources stay uncorrelated
+    time_vector = np.arange(structure.blocksize) / 16000
+    frequencies = 2 * np.pi * (2000 + 37 * np.arange(len(directions)))
+    phases = rng.uniform(-np.pi, np.pi, (len(directions), 1))
+    waveforms = np.exp(1j * (frequencies[:, np.newaxis] * time_vector + phases))
+    wavevectors = [doa.WaveVector(doa.spherical_to_cartesian(np.array([WAVENUMBER, *direction])))
+                   for direction in directions]
+    noise = rng.standard_normal((structure.blocksize, len(structure.elements), 2)) @ np.array([1, 1j]) * 0.05
+    return waveforms.T @ structure.steering_vector(wavevectors) + noise
+
+
+def test_tracked_subspace_converges_to_the_eigendecomposition():
+    rng = np.random.default_rng(0)
+    elements = [doa.Element(position, 16000) for position in rng.random((8, 3)) * 0.1]
+    structure = doa.Structure(elements, WAVENUMBER, 30, 1024, inclination_resolution=30, azimuth_resolution=60)
+    directions = [(1.0, 1.5), (2.0, 4.0)]
+    tracking = doa.SubspaceTrackingMusic(structure, 2, refresh_interval=1000, num_peaks=2)
+    music = doa.Music(structure, 2, num_peaks=2)
+
+    # Start from the subspace of other sources, then track stationary ones
+    tracking.prepare(analytic_audio(structure, [(0.5, 0.5), (2.5, 3.0)], rng))
+    for _ in range(50):
+        data = analytic_audio(structure, directions, rng)
+        tracking.prepare(data)
+
+    eigvals, eigvecs = np.linalg.eigh(doa.calculate_covariance(data))
+    signal_subspace = eigvecs[:, np.argsort(eigvals)[::-1][:2]]
+    tracked = tracking.signal_subspace
+    assert np.allclose(tracked.conj().T @ tracked, np.eye(2), atol=1e-6)
+    assert np.allclose(tracked @ tracked.conj().T, signal_subspace @ signal_subspace.conj().T, atol=0.05)
+
+    peaks = tracking.process(data)
+    expected = music.process(data)
+    assert np.allclose(peaks[np.argsort(peaks[:, 1]), :2], expected[np.argsort(expected[:, 1]), :2], atol=0.02)